@@ -0,0 +1,219 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+from sqlalchemy import and_, func, insert, or_, select
+from models import (
+    db, upsert, Achievement, UserAchievement, UserStats, ScenarioCompletion,
+    ScavengerHuntTask, TaskSubmission, Scenario
+)
+from leaderboard import GLOBAL_SCOPE, add_points, scenario_scope
+
+logger = logging.getLogger(__name__)
+
+def _apply_stats_delta(user_id: int, points: int, scenarios: int) -> Tuple[int, int, int, int]:
+    """
+    Atomically add a delta to a user's running totals.
+
+    Returns (old_points, new_points, old_scenarios, new_scenarios). The
+    row is created or incremented in one upsert, so concurrent completions
+    for the same user neither lose updates nor race to insert.
+    """
+    now = datetime.utcnow()
+    stmt = upsert(UserStats).values(
+        user_id=user_id, total_points=points, scenarios_completed=scenarios, updated_at=now
+    )
+    new_points, new_scenarios = db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={
+                'total_points': UserStats.total_points + points,
+                'scenarios_completed': UserStats.scenarios_completed + scenarios,
+                'updated_at': now
+            }
+        ).returning(UserStats.total_points, UserStats.scenarios_completed)
+    ).one()
+    return new_points - points, new_points, new_scenarios - scenarios, new_scenarios
+
+def _crossed_achievements(user_id: int, old_points: int, new_points: int,
+                          old_scenarios: int, new_scenarios: int) -> List[Achievement]:
+    """
+    Achievements whose last outstanding threshold falls inside the delta.
+
+    Only rows with a threshold in (old, new] are read, via the indexed
+    requirement columns; an achievement with two requirements qualifies once
+    both are met and at least one of them was crossed by this delta.
+    """
+    points_required = func.coalesce(Achievement.points_required, 0)
+    scenarios_required = func.coalesce(Achievement.scenarios_required, 0)
+    already_unlocked = select(UserAchievement.achievement_id).where(
+        UserAchievement.user_id == user_id
+    )
+
+    return Achievement.query.filter(
+        Achievement.user_id.is_(None),
+        or_(
+            and_(Achievement.points_required > old_points,
+                 Achievement.points_required <= new_points),
+            and_(Achievement.scenarios_required > old_scenarios,
+                 Achievement.scenarios_required <= new_scenarios)
+        ),
+        points_required <= new_points,
+        scenarios_required <= new_scenarios,
+        Achievement.id.not_in(already_unlocked)
+    ).all()
+
+def record_completions(completions: Iterable[Dict[str, Any]]) -> Dict[int, List[Achievement]]:
+    """
+    Record scenario completions and unlock the achievements they earn.
+
+    Each completion is a dict of ScenarioCompletion columns (user_id,
+    scenario_id, session_id, points_earned, character_id). All rows are
+    inserted in one statement, each user's totals are updated once with the
+    summed delta, and newly earned achievements are unlocked in one bulk
+    insert, all in a single transaction. A user completes a scenario only
+    once: rows for an already completed (user, scenario) are skipped and
+    earn nothing. Returns the unlocked achievements per user.
+    """
+    now = datetime.utcnow()
+    rows = [{
+        'user_id': completion.get('user_id'),
+        'scenario_id': completion['scenario_id'],
+        'session_id': completion['session_id'],
+        'character_id': completion.get('character_id'),
+        'points_earned': completion.get('points_earned') or 0,
+        'completed_at': completion.get('completed_at') or now
+    } for completion in completions]
+    if not rows:
+        return {}
+
+    try:
+        inserted = db.session.execute(
+            upsert(ScenarioCompletion).values(rows)
+            .on_conflict_do_nothing(index_elements=['user_id', 'scenario_id'])
+            .returning(ScenarioCompletion.user_id, ScenarioCompletion.scenario_id,
+                       ScenarioCompletion.points_earned)
+        ).all()
+
+        # Totals and scores follow only the rows that were actually inserted
+        deltas: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+        scenario_points: Dict[Tuple[int, int], int] = defaultdict(int)
+        for user_id, scenario_id, points in inserted:
+            if user_id is not None:
+                deltas[user_id][0] += points
+                deltas[user_id][1] += 1
+                scenario_points[(user_id, scenario_id)] += points
+
+        unlocked: Dict[int, List[Achievement]] = {}
+        unlock_rows = []
+        # Fixed lock order keeps concurrent batches from deadlocking
+        for user_id in sorted(deltas):
+            points, scenarios = deltas[user_id]
+            old_points, new_points, old_scenarios, new_scenarios = _apply_stats_delta(
+                user_id, points, scenarios
+            )
+            earned = _crossed_achievements(
+                user_id, old_points, new_points, old_scenarios, new_scenarios
+            )
+            if earned:
+                unlocked[user_id] = earned
+                unlock_rows.extend(
+                    {'user_id': user_id, 'achievement_id': a.id, 'unlocked_at': now}
+                    for a in earned
+                )
+
+        if unlock_rows:
+            db.session.execute(insert(UserAchievement), unlock_rows)
+
+        for (user_id, scenario_id), points in sorted(scenario_points.items()):
+            add_points(user_id, points, [GLOBAL_SCOPE, scenario_scope(scenario_id)])
+
+        db.session.commit()
+        for user_id, earned in unlocked.items():
+            logger.info(f"User {user_id} unlocked achievements: {[a.name for a in earned]}")
+        return unlocked
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to record {len(rows)} completions: {str(e)}")
+        raise
+
+def record_completion(user_id: int, scenario: Scenario, session_id: str,
+                      character_id: Optional[int] = None,
+                      points: Optional[int] = None) -> List[Achievement]:
+    """Record one completion; returns the achievements it unlocked"""
+    unlocked = record_completions([{
+        'user_id': user_id,
+        'scenario_id': scenario.id,
+        'session_id': session_id,
+        'character_id': character_id,
+        'points_earned': scenario.points if points is None else points
+    }])
+    return unlocked.get(user_id, [])
+
+def complete_scenario_if_done(user_id: int, scenario: Scenario, session_id: str) -> Optional[List[Achievement]]:
+    """
+    Record a completion once every task of a scavenger hunt has a verified
+    submission from the user. Returns the unlocked achievements, or None if
+    the scenario is not (newly) complete. The check below is only a fast
+    path; a concurrent duplicate is skipped by the unique (user, scenario)
+    constraint when inserting.
+    """
+    already_completed = db.session.query(ScenarioCompletion.id).filter_by(
+        user_id=user_id, scenario_id=scenario.id
+    ).first()
+    if already_completed:
+        return None
+
+    task_count = db.session.query(func.count(ScavengerHuntTask.id)).filter(
+        ScavengerHuntTask.scenario_id == scenario.id
+    ).scalar()
+    verified_count = db.session.query(
+        func.count(func.distinct(TaskSubmission.task_id))
+    ).join(ScavengerHuntTask).filter(
+        ScavengerHuntTask.scenario_id == scenario.id,
+        TaskSubmission.user_id == user_id,
+        TaskSubmission.is_verified.is_(True)
+    ).scalar()
+
+    if not task_count or verified_count < task_count:
+        return None
+    return record_completion(user_id, scenario, session_id)
+
+def unlocked_achievements(user_id: int) -> List[Achievement]:
+    """Achievements a user has unlocked, newest first"""
+    return Achievement.query.join(
+        UserAchievement, UserAchievement.achievement_id == Achievement.id
+    ).filter(
+        UserAchievement.user_id == user_id
+    ).order_by(UserAchievement.unlocked_at.desc()).all()
+
+def rebuild_user_stats(user_id: Optional[int] = None) -> int:
+    """
+    Recompute running totals from ScenarioCompletion rows.
+
+    A one-off backfill or repair step, not something to run per request.
+    Returns the number of users updated.
+    """
+    try:
+        query = db.session.query(
+            ScenarioCompletion.user_id,
+            func.coalesce(func.sum(ScenarioCompletion.points_earned), 0),
+            func.count(ScenarioCompletion.id)
+        ).filter(ScenarioCompletion.user_id.isnot(None))
+        if user_id is not None:
+            query = query.filter(ScenarioCompletion.user_id == user_id)
+
+        totals = query.group_by(ScenarioCompletion.user_id).all()
+        for uid, points, scenarios in totals:
+            db.session.merge(UserStats(
+                user_id=uid,
+                total_points=int(points),
+                scenarios_completed=scenarios
+            ))
+        db.session.commit()
+        return len(totals)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to rebuild user stats: {str(e)}")
+        raise
@@ -4,6 +4,7 @@ import logging
 from typing import Dict, Any
 from transformers import pipeline
 from flask_login import current_user
+import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -79,15 +80,16 @@ def enhance_with_openai(prompt: str, spiciness_level: int) -> str:
         
     try:
         system_prompt = get_spiciness_prompt(spiciness_level)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
+        with metrics.timed('openai', 'character_description'):
+            response = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=1000,
+                temperature=0.7
+            )
         return response.choices[0].message.content
     except Exception as e:
         logger.error(f"Error with OpenAI generation: {str(e)}")
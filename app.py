@@ -1,12 +1,17 @@
 import os
 import logging
-import uuid
-from flask import Flask, render_template, session, request
+from flask import Flask, render_template
 from flask_session import Session
 from flask_wtf.csrf import CSRFProtect
 from flask_login import LoginManager
 from sqlalchemy import text
 from models import db
+from template_cache import configure_templates, measure_first_request
+from request_logging import setup_request_logging
+import metrics
+import profiler
+from db_pool import engine_options, init_pool
+import query_loading
 
 # Configure logging
 logging.basicConfig(
@@ -52,11 +57,13 @@ def create_app():
         app.config.update(
             SECRET_KEY=os.environ.get('FLASK_SECRET_KEY', os.urandom(32)),
             SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL'),
+            SQLALCHEMY_ENGINE_OPTIONS=engine_options(os.environ.get('DATABASE_URL')),
             SQLALCHEMY_TRACK_MODIFICATIONS=False,
             SESSION_TYPE='filesystem',
-            SESSION_FILE_DIR='flask_session',
-            TEMPLATES_AUTO_RELOAD=True
+            SESSION_FILE_DIR=os.environ.get('SESSION_FILE_DIR', 'flask_session'),
+            PRODUCTION=os.environ.get('FLASK_ENV') == 'production'
         )
+        configure_templates(app)
         
         # Initialize extensions
         if not initialize_extensions(app):
@@ -65,6 +72,7 @@ def create_app():
         # Verify database connection
         if not verify_database_connection(app):
             return None
+        init_pool(app)
             
         # Create database tables
         with app.app_context():
@@ -73,19 +81,13 @@ def create_app():
         # Import and register routes
         from routes import register_routes
         register_routes(app)
+        metrics.init_app(app)
+        profiler.init_app(app)
+        query_loading.init_app(app)
+        measure_first_request(app)
         
         # Request logging
-        @app.before_request
-        def log_request():
-            request_id = str(uuid.uuid4())
-            session['request_id'] = request_id
-            logger.info(f"Request {request_id}: {request.method} {request.path}")
-        
-        @app.after_request
-        def log_response(response):
-            request_id = session.get('request_id', 'unknown')
-            logger.info(f"Response {request_id}: {response.status}")
-            return response
+        setup_request_logging(app)
         
         # Error handlers
         @app.errorhandler(404)
@@ -107,7 +109,7 @@ def create_app():
 def load_user(user_id):
     try:
         from models import User
-        return User.query.get(int(user_id))
+        return User.query.options(*query_loading.loader_options(User)).get(int(user_id))
     except Exception as e:
         logger.error(f"Error loading user {user_id}: {str(e)}")
         return None
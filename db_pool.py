@@ -0,0 +1,74 @@
+import os
+import time
+import logging
+from typing import Any, Dict
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+import metrics
+from models import db
+
+logger = logging.getLogger(__name__)
+
+POOL_WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+pool_wait = metrics.registry.histogram(
+    'db_pool_wait_seconds', 'Time spent waiting to check out a pooled connection', (), POOL_WAIT_BUCKETS
+)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - started)
+
+def engine_options(database_uri: str) -> Dict[str, Any]:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS from the environment.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE size
+    the pool; connections are pre-pinged on checkout so ones dropped by the
+    server or a proxy are replaced instead of failing a request. SQLite
+    keeps its own single-file pooling and gets no options.
+    """
+    if not database_uri or make_url(database_uri).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0'
+    }
+
+def init_pool(app) -> None:
+    """
+    Export pool gauges and make the pool safe to use across fork.
+
+    Connections opened in the parent (e.g. by the startup connection check)
+    must not be shared with prefork workers, so each child drops the
+    inherited pool without closing the parent's sockets and opens its own.
+    """
+    with app.app_context():
+        engine = db.engine
+    if not isinstance(engine.pool, QueuePool):
+        return
+
+    # Read engine.pool on each scrape: dispose() swaps in a fresh pool
+    capacity = engine.pool.size() + max(engine.pool._max_overflow, 0)
+    metrics.registry.gauge('db_pool_size', 'Configured pool size', lambda: engine.pool.size())
+    metrics.registry.gauge(
+        'db_pool_checked_out', 'Connections currently in use', lambda: engine.pool.checkedout()
+    )
+    metrics.registry.gauge(
+        'db_pool_utilization', 'Checked-out connections as a fraction of size plus overflow',
+        lambda: engine.pool.checkedout() / capacity if capacity else 0.0
+    )
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+    logger.info(f"Database pool: size={engine.pool.size()} capacity={capacity}")
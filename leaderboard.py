@@ -0,0 +1,295 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, insert
+import metrics
+from models import db, upsert, LeaderboardScore, ScenarioCompletion, ScavengerHuntTask, TaskSubmission
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = 'global'
+REFRESH_INTERVAL = 60  # seconds before a scope is reloaded from the table
+
+def scenario_scope(scenario_id: int) -> str:
+    return f'scenario:{scenario_id}'
+
+class _Node:
+    __slots__ = ('key', 'priority', 'size', 'left', 'right')
+
+    def __init__(self, key: Tuple):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left: Optional['_Node'] = None
+        self.right: Optional['_Node'] = None
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node else 0
+
+def _update(node: _Node) -> _Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+def _split(node: Optional[_Node], key: Tuple) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Split into (keys < key, keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _update(node), right
+    left, node.left = _split(node.left, key)
+    return left, _update(node)
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+class OrderStatisticTree:
+    """Treap with subtree sizes: insert, remove, rank and k-th in O(log n) expected"""
+
+    def __init__(self):
+        self.root: Optional[_Node] = None
+
+    def __len__(self) -> int:
+        return _size(self.root)
+
+    def insert(self, key: Tuple) -> None:
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key: Tuple) -> None:
+        left, rest = _split(self.root, key)
+        match, right = _split(rest, (*key, 0))  # keys are unique tuples
+        if match is not None:
+            match = _merge(match.left, match.right)
+        self.root = _merge(_merge(left, match), right)
+
+    def count_less(self, key: Tuple) -> int:
+        """Number of keys strictly less than key"""
+        node, count = self.root, 0
+        while node is not None:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def kth(self, index: int) -> Tuple:
+        """Key at 0-based position index"""
+        node = self.root
+        while node is not None:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.key
+            else:
+                index -= left_size + 1
+                node = node.right
+        raise IndexError(index)
+
+class Leaderboard:
+    """Scores for one scope, ordered by score descending then user id"""
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        self.scores: Dict[int, int] = {}
+        self.tree = OrderStatisticTree()
+        self.loaded_at = time.monotonic()
+
+    def set_score(self, user_id: int, score: int) -> None:
+        old = self.scores.get(user_id)
+        if old is not None:
+            self.tree.remove((-old, user_id))
+        self.scores[user_id] = score
+        self.tree.insert((-score, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based competition rank (tied scores share a rank), None if unranked"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.tree.count_less((-score, float('-inf'))) + 1
+
+    def top(self, n: int = 10, offset: int = 0) -> List[Dict[str, int]]:
+        entries = []
+        for index in range(offset, min(offset + n, len(self.tree))):
+            neg_score, user_id = self.tree.kth(index)
+            entries.append({
+                'user_id': user_id,
+                'score': -neg_score,
+                'rank': self.tree.count_less((neg_score, float('-inf'))) + 1
+            })
+        return entries
+
+class LeaderboardRegistry:
+    """
+    In-process leaderboards backed by the LeaderboardScore table.
+
+    A scope is loaded from the table on first use and then kept current by
+    applying this process's committed score changes. Scopes are reloaded
+    after REFRESH_INTERVAL so changes committed by other workers show up.
+    """
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._boards: Dict[str, Leaderboard] = {}
+        self._lock = threading.Lock()
+        # Per-scope load locks, and changes applied to scopes mid-load
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loading: Dict[str, List[Tuple[int, int]]] = {}
+
+    def get(self, scope: str) -> Leaderboard:
+        with self._lock:
+            board = self._boards.get(scope)
+            if board is not None and not self._stale(board):
+                metrics.cache_hit('leaderboard')
+                return board
+            load_lock = self._load_locks.setdefault(scope, threading.Lock())
+        metrics.cache_miss('leaderboard')
+
+        # While another thread refreshes this scope, serve the previous board
+        if not load_lock.acquire(blocking=board is None):
+            return board
+        try:
+            with self._lock:
+                current = self._boards.get(scope)
+                if current is not None and not self._stale(current):
+                    return current
+                self._loading[scope] = []
+            # Query outside the registry lock so reads and updates of other
+            # scopes are not blocked while this one loads
+            try:
+                board = self._load(scope)
+            except Exception:
+                with self._lock:
+                    self._loading.pop(scope, None)
+                raise
+            with self._lock:
+                # Replay changes committed during the query in commit order,
+                # so the board ends on the newest score whether or not the
+                # query saw them
+                for user_id, score in self._loading.pop(scope):
+                    board.set_score(user_id, score)
+                self._boards[scope] = board
+                return board
+        finally:
+            load_lock.release()
+
+    def _stale(self, board: Leaderboard) -> bool:
+        return time.monotonic() - board.loaded_at > self.refresh_interval
+
+    def _load(self, scope: str) -> Leaderboard:
+        board = Leaderboard(scope)
+        rows = db.session.query(LeaderboardScore.user_id, LeaderboardScore.score).filter(
+            LeaderboardScore.scope == scope
+        ).all()
+        for user_id, score in rows:
+            board.set_score(user_id, score)
+        return board
+
+    def apply(self, changes: Iterable[Tuple[str, int, int]]) -> None:
+        """Apply committed (scope, user_id, score) changes to loaded scopes"""
+        with self._lock:
+            for scope, user_id, score in changes:
+                board = self._boards.get(scope)
+                if board is not None:
+                    board.set_score(user_id, score)
+                loading = self._loading.get(scope)
+                if loading is not None:
+                    loading.append((user_id, score))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._boards.clear()
+
+registry = LeaderboardRegistry()
+
+def add_points(user_id: int, points: int, scopes: Iterable[str]) -> None:
+    """
+    Add points to a user's score in each scope, within the caller's transaction.
+
+    The table is incremented in the database; the in-memory leaderboards
+    pick up the new scores only once the transaction commits.
+    """
+    if not points:
+        return
+    pending = db.session().info.setdefault('leaderboard_pending', [])
+    now = datetime.utcnow()
+    for scope in scopes:
+        # One statement, so concurrent first scores for a user cannot both insert
+        stmt = upsert(LeaderboardScore).values(scope=scope, user_id=user_id, score=points, updated_at=now)
+        score = db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=['scope', 'user_id'],
+                set_={'score': LeaderboardScore.score + points, 'updated_at': now}
+            ).returning(LeaderboardScore.score)
+        ).scalar_one()
+        pending.append((scope, user_id, score))
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_committed_scores(session):
+    pending = session.info.pop('leaderboard_pending', None)
+    if pending:
+        registry.apply(pending)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_rolled_back_scores(session):
+    session.info.pop('leaderboard_pending', None)
+
+def top(scope: str = GLOBAL_SCOPE, n: int = 10, offset: int = 0) -> List[Dict[str, int]]:
+    return registry.get(scope).top(n, offset)
+
+def rank(user_id: int, scope: str = GLOBAL_SCOPE) -> Optional[int]:
+    return registry.get(scope).rank(user_id)
+
+def rebuild_leaderboards() -> int:
+    """
+    Recompute the global and per-scenario scores from completions and
+    verified submissions. A one-off backfill, not a per-request step.
+    Returns the number of score rows written.
+    """
+    try:
+        totals: Dict[Tuple[str, int], int] = {}
+
+        def add(scope: str, user_id: int, points: int) -> None:
+            totals[(scope, user_id)] = totals.get((scope, user_id), 0) + (points or 0)
+
+        completions = db.session.query(
+            ScenarioCompletion.user_id, ScenarioCompletion.scenario_id,
+            db.func.sum(ScenarioCompletion.points_earned)
+        ).filter(ScenarioCompletion.user_id.isnot(None)).group_by(
+            ScenarioCompletion.user_id, ScenarioCompletion.scenario_id
+        )
+        submissions = db.session.query(
+            TaskSubmission.user_id, ScavengerHuntTask.scenario_id,
+            db.func.sum(ScavengerHuntTask.points)
+        ).join(ScavengerHuntTask).filter(TaskSubmission.is_verified.is_(True)).group_by(
+            TaskSubmission.user_id, ScavengerHuntTask.scenario_id
+        )
+        for user_id, scenario_id, points in list(completions) + list(submissions):
+            add(GLOBAL_SCOPE, user_id, points)
+            add(scenario_scope(scenario_id), user_id, points)
+
+        db.session.query(LeaderboardScore).delete()
+        if totals:
+            db.session.execute(insert(LeaderboardScore), [
+                {'scope': scope, 'user_id': user_id, 'score': score}
+                for (scope, user_id), score in totals.items()
+            ])
+        db.session.commit()
+        registry.clear()
+        return len(totals)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to rebuild leaderboards: {str(e)}")
+        raise
@@ -0,0 +1,126 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 15  # seconds between keep-alive comments
+MAX_PENDING = 256  # coalesced updates held per connection before a resync
+
+class Subscription:
+    """
+    One connected client's mailbox.
+
+    Updates are keyed (e.g. per task), and a newer update replaces an
+    unsent one with the same key, so a slow client receives the latest
+    state rather than every intermediate step.
+    """
+
+    def __init__(self, broker: 'UpdateBroker', scenario_id: int, user_id: int):
+        self.broker = broker
+        self.scenario_id = scenario_id
+        self.user_id = user_id
+        self._pending: 'OrderedDict[Hashable, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.overflowed = False
+
+    def push(self, key: Hashable, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = event
+            if len(self._pending) > MAX_PENDING:
+                self._pending.clear()
+                self.overflowed = True
+            self._ready.set()
+
+    def drain(self, timeout: float) -> List[Dict[str, Any]]:
+        """Wait up to timeout for updates; returns them in publish order"""
+        if not self._ready.wait(timeout):
+            return []
+        with self._lock:
+            events = list(self._pending.values())
+            self._pending.clear()
+            if self.overflowed:
+                events = [{'event': 'resync', 'data': {}}]
+                self.overflowed = False
+            self._ready.clear()
+        return events
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+class UpdateBroker:
+    """
+    In-process fan-out of scavenger hunt updates to SSE connections.
+
+    Publishing only touches the mailboxes of a scenario's subscribers, but
+    each open SSE connection holds one werkzeug thread for as long as the
+    client stays connected, so concurrent streams are limited by the
+    threads the server will run. Under SERVER_MODE=gevent an idle stream
+    parks a greenlet instead, and thousands fit in one process.
+    Subscribers only see updates published by their own process.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, scenario_id: int, user_id: int) -> Subscription:
+        subscription = Subscription(self, scenario_id, user_id)
+        with self._lock:
+            self._subscribers.setdefault(scenario_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.scenario_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.scenario_id]
+
+    def connection_count(self, scenario_id: Optional[int] = None) -> int:
+        with self._lock:
+            if scenario_id is not None:
+                return len(self._subscribers.get(scenario_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, scenario_id: int, event: str, key: Hashable, data: Dict[str, Any],
+                user_id: Optional[int] = None) -> int:
+        """
+        Send an update to a scenario's subscribers, or only to user_id's
+        connections when given. Returns the number of connections reached.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(scenario_id, ()))
+        message = {'event': event, 'data': data}
+        reached = 0
+        for subscription in subscribers:
+            if user_id is None or subscription.user_id == user_id:
+                subscription.push((event, key), message)
+                reached += 1
+        return reached
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def stream_updates(subscription: Subscription, snapshot: Optional[Dict[str, Any]] = None,
+                   heartbeat: float = HEARTBEAT_INTERVAL) -> Iterator[str]:
+    """SSE body for one connection; unsubscribes when the client goes away"""
+    try:
+        yield 'retry: 3000\n\n'
+        if snapshot is not None:
+            yield format_sse('snapshot', snapshot)
+        while True:
+            events = subscription.drain(heartbeat)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            yield ''.join(format_sse(e['event'], e['data']) for e in events)
+    finally:
+        subscription.close()
+
+broker = UpdateBroker()
@@ -1,4 +1,11 @@
 import os
+
+# gevent must patch the standard library before anything else imports it
+SERVER_MODE = os.environ.get('SERVER_MODE', 'threaded')
+if SERVER_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
 import sys
 import time
 import signal
@@ -44,6 +51,40 @@ def cleanup_resources():
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
 
+def enable_cooperative_clients():
+    """
+    Make the blocking clients yield to other greenlets while they wait.
+
+    The OpenAI client's sockets are covered by monkey patching; psycopg2
+    and gRPC (Google Vision) need their own hooks.
+    """
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        logger.warning("psycogreen not installed; database queries will block the worker")
+    try:
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except ImportError:
+        logger.warning("gRPC gevent support unavailable; Vision calls will block the worker")
+
+def serve_gevent(app, host, port):
+    """
+    Serve with one greenlet per connection.
+
+    Routes waiting on OpenAI, Vision or the database park their greenlet
+    instead of a thread, so one worker holds hundreds of in-flight
+    generations and idle live-update streams. CPU-bound work (local
+    Hugging Face generation, OpenCV) still blocks the whole worker.
+    """
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+
+    max_connections = int(os.environ.get('GEVENT_MAX_CONNECTIONS', 1000))
+    logger.info(f"Starting gevent server on {host}:{port} (max {max_connections} connections)")
+    WSGIServer((host, port), app, spawn=Pool(max_connections)).serve_forever()
+
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
     logger.info(f"Received signal {signum}, shutting down")
@@ -66,6 +107,9 @@ if __name__ == "__main__":
         cleanup_resources()
         time.sleep(1)  # Wait for resources to be freed
         
+        if SERVER_MODE == 'gevent':
+            enable_cooperative_clients()
+
         # Create Flask app
         app = create_app()
         if not app:
@@ -80,15 +124,18 @@ if __name__ == "__main__":
         )
 
         # Start server
-        logger.info(f"Starting Flask server on {host}:{port}")
-        run_simple(
-            hostname=host,
-            port=port,
-            application=app,
-            use_reloader=False,
-            use_debugger=True,
-            threaded=True
-        )
+        if SERVER_MODE == 'gevent':
+            serve_gevent(app, host, port)
+        else:
+            logger.info(f"Starting Flask server on {host}:{port}")
+            run_simple(
+                hostname=host,
+                port=port,
+                application=app,
+                use_reloader=False,
+                use_debugger=True,
+                threaded=True
+            )
     except Exception as e:
         logger.error(f"Server failed to start: {str(e)}")
         cleanup_resources()
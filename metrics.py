@@ -0,0 +1,248 @@
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from flask import Response, abort, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+LOCAL_ADDRESSES = frozenset({'127.0.0.1', '::1'})
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value:g}')
+        return lines
+
+class Gauge:
+    """Value read from a callback when /metrics is scraped"""
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        try:
+            lines.append(f'{self.name} {float(self.callback()):g}')
+        except Exception as e:
+            logger.error(f"Failed to read gauge {self.name}: {str(e)}")
+        return lines
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels.
+
+    An observation is one bisect over the bucket bounds and a few list
+    updates under a lock, so recording costs a couple of microseconds.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                label_text = _format_labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{label_text} {series[-1]:g}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], float]) -> Gauge:
+        """Register a gauge; registering the same name again replaces its callback"""
+        with self._lock:
+            gauge = self._metrics[name] = Gauge(name, help_text, callback)
+            return gauge
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help_text, labels, buckets))
+
+    def _register(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint', ('endpoint', 'method', 'status')
+)
+request_queries = registry.histogram(
+    'db_queries_per_request', 'Database queries issued per request', ('endpoint',), QUERY_COUNT_BUCKETS
+)
+request_query_time = registry.histogram(
+    'db_time_per_request_seconds', 'Time spent in database queries per request', ('endpoint',)
+)
+external_latency = registry.histogram(
+    'external_call_duration_seconds', 'LLM and Vision API call latency', ('service', 'operation', 'outcome')
+)
+cache_requests = registry.counter(
+    'cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result')
+)
+
+class _QueryStats:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+_query_stats: ContextVar[Optional[_QueryStats]] = ContextVar('query_stats', default=None)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+@contextmanager
+def timed(service: str, operation: str) -> Iterator[None]:
+    """Record the latency of an external call, labelled ok or error"""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        external_latency.observe(time.perf_counter() - started, service, operation, outcome)
+
+def cache_hit(cache: str) -> None:
+    cache_requests.inc(cache, 'hit')
+
+def cache_miss(cache: str) -> None:
+    cache_requests.inc(cache, 'miss')
+
+def init_app(app) -> None:
+    """
+    Time every non-static request and serve /metrics.
+
+    /metrics answers only local clients (plus METRICS_ALLOWED_IPS, comma
+    separated) and 404s for everyone else.
+    """
+    static_prefix = (app.static_url_path or '/static') + '/'
+    allowed = LOCAL_ADDRESSES | {
+        ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()
+    }
+
+    @app.before_request
+    def start_request_metrics():
+        if request.path.startswith(static_prefix):
+            return
+        g.metrics_started = time.perf_counter()
+        g.metrics_token = _query_stats.set(_QueryStats())
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        request_latency.observe(
+            time.perf_counter() - started, endpoint, request.method, str(response.status_code)
+        )
+        stats = _query_stats.get()
+        if stats is not None:
+            request_queries.observe(stats.count, endpoint)
+            request_query_time.observe(stats.seconds, endpoint)
+        return response
+
+    @app.teardown_request
+    def clear_request_metrics(exc):
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            _query_stats.reset(token)
+
+    def metrics_endpoint():
+        # A forwarded request came through a proxy, even a local one
+        if request.remote_addr not in allowed or 'X-Forwarded-For' in request.headers:
+            abort(404)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
@@ -56,5 +56,49 @@ def add_scavenger_hunt_tables():
         db.session.rollback()
         return False
 
+def add_scenario_completion_unique():
+    """Drop repeat completions of a scenario by a user, then enforce one per (user, scenario)"""
+    try:
+        app = create_app()
+        with app.app_context():
+            result = db.session.execute(text("""
+                DELETE FROM scenario_completion
+                WHERE user_id IS NOT NULL AND id NOT IN (
+                    SELECT MIN(id) FROM scenario_completion
+                    WHERE user_id IS NOT NULL
+                    GROUP BY user_id, scenario_id
+                )
+            """))
+            db.session.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS scenario_completion_user_id_scenario_id_key
+                ON scenario_completion (user_id, scenario_id)
+            """))
+            db.session.commit()
+            logger.info(f"Removed {result.rowcount} duplicate scenario completions")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding scenario completion constraint: {str(e)}")
+        db.session.rollback()
+        return False
+
+def backfill_user_stats():
+    """Populate UserStats totals and leaderboard scores from existing completions"""
+    try:
+        from achievements import rebuild_user_stats
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            count = rebuild_user_stats()
+            logger.info(f"Backfilled stats for {count} users")
+            from leaderboard import rebuild_leaderboards
+            count = rebuild_leaderboards()
+            logger.info(f"Backfilled {count} leaderboard scores")
+            return True
+    except Exception as e:
+        logger.error(f"Error backfilling user stats: {str(e)}")
+        return False
+
 if __name__ == "__main__":
     add_scavenger_hunt_tables()
+    add_scenario_completion_unique()
+    backfill_user_stats()
@@ -2,10 +2,16 @@ from datetime import datetime
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
 # Initialize SQLAlchemy without app context
 db = SQLAlchemy()
 
+def upsert(model):
+    """INSERT for the session's dialect, with on_conflict_do_update/do_nothing"""
+    dialect = sqlite if db.session.get_bind().dialect.name == 'sqlite' else postgresql
+    return dialect.insert(model)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -88,13 +94,62 @@ class Achievement(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     icon = db.Column(db.String(100))
-    points_required = db.Column(db.Integer, default=0)
-    scenarios_required = db.Column(db.Integer, default=0)
+    points_required = db.Column(db.Integer, default=0, index=True)
+    scenarios_required = db.Column(db.Integer, default=0, index=True)
     session_id = db.Column(db.String(100))
     unlocked_at = db.Column(db.DateTime, default=None)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
+class UserAchievement(db.Model):
+    """An achievement unlocked by a user; definitions live in Achievement"""
+    __table_args__ = (db.UniqueConstraint('user_id', 'achievement_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    achievement_id = db.Column(db.Integer, db.ForeignKey('achievement.id'), nullable=False)
+    unlocked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    achievement = db.relationship('Achievement')
+
+class UserStats(db.Model):
+    """Running per-user totals, kept in step with ScenarioCompletion rows"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    scenarios_completed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class LeaderboardScore(db.Model):
+    """Materialized score per user and leaderboard scope ("global", "scenario:<id>", ...)"""
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'user_id'),
+        db.Index('ix_leaderboard_scope_score', 'scope', 'score'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    score = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StoryScene(db.Model):
+    """A generated story scene; regenerating adds a version instead of overwriting"""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'character_id', 'scenario_id', 'version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    character_id = db.Column(db.Integer, db.ForeignKey('character.id'), nullable=False)
+    scenario_id = db.Column(db.Integer, db.ForeignKey('scenario.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    content = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class ScenarioCompletion(db.Model):
+    # One completion per user and scenario; anonymous (NULL user) rows never conflict
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'scenario_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     scenario_id = db.Column(db.Integer, db.ForeignKey('scenario.id'), nullable=False)
     session_id = db.Column(db.String(100), nullable=False)
@@ -10,6 +10,7 @@ from datetime import datetime
 import json
 import atexit
 import shutil
+import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -214,7 +215,8 @@ def verify_photo_content(photo_path, required_objects, min_confidence=0.7, requi
         image = vision.Image(content=content)
         
         # Detect objects
-        objects = client.object_localization(image=image).localized_object_annotations
+        with metrics.timed('vision', 'object_localization'):
+            objects = client.object_localization(image=image).localized_object_annotations
         
         # Check for required objects
         found_objects = {}
@@ -244,7 +246,8 @@ def verify_photo_content(photo_path, required_objects, min_confidence=0.7, requi
         location_results = {'verified': True, 'confidence': 1.0}
         if required_location:
             # Get image location data
-            location_info = client.landmark_detection(image=image).landmark_annotations
+            with metrics.timed('vision', 'landmark_detection'):
+                location_info = client.landmark_detection(image=image).landmark_annotations
             location_verified = any(
                 required_location.lower() in landmark.description.lower()
                 for landmark in location_info
@@ -0,0 +1,180 @@
+import os
+import sys
+import hmac
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(ROOT, 'profiles'))
+REQUEST_INTERVAL = 0.001  # seconds between samples of a profiled request
+FLUSH_INTERVAL = 60  # seconds between writes of the continuous profile
+MAX_DEPTH = 128
+
+def collapse_stack(frame) -> str:
+    """Frame chain as 'file:function;...' from the outermost call inwards"""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def write_collapsed(counts: Counter, path: str) -> str:
+    """Write 'stack count' lines, the input format of flamegraph.pl and speedscope"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp_path, path)
+    return path
+
+def merge_profiles(paths: Iterable[str]) -> Counter:
+    """Sum collapsed-stack files, e.g. the continuous profiles of all workers"""
+    merged = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack and count.isdigit():
+                    merged[stack] += int(count)
+    return merged
+
+class StackSampler:
+    """
+    Samples Python stacks from a background thread.
+
+    With thread_id set only that thread is sampled (one request);
+    otherwise every thread except the sampler is. Sampling reads
+    sys._current_frames(), so the profiled code is not instrumented and
+    the overhead scales with the sampling rate, not with call counts.
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None,
+                 flush_path: Optional[str] = None, flush_interval: float = FLUSH_INTERVAL):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.flush_path = flush_path
+        self.flush_interval = flush_interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'StackSampler':
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self) -> None:
+        own_id = threading.get_ident()
+        if self.thread_id is not None:
+            frame = sys._current_frames().get(self.thread_id)
+            frames = [frame] if frame is not None else []
+        else:
+            frames = [f for tid, f in sys._current_frames().items() if tid != own_id]
+        for frame in frames:
+            self.counts[collapse_stack(frame)] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+                if self.flush_path and time.monotonic() - last_flush >= self.flush_interval:
+                    write_collapsed(self.counts, self.flush_path)
+                    last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"Stack sampling failed: {str(e)}")
+        if self.flush_path and self.counts:
+            write_collapsed(self.counts, self.flush_path)
+
+def init_app(app) -> None:
+    """
+    Opt-in profiling, both off unless configured.
+
+    PROFILE_TOKEN: a request sent with 'X-Profile: <token>' is sampled
+    every millisecond and its collapsed stacks are written to PROFILE_DIR;
+    the file name is returned in X-Profile-File.
+
+    PROFILE_CONTINUOUS_HZ: every worker samples all of its threads at this
+    rate and rewrites profiles/continuous-<pid>.collapsed every minute.
+    Merge the workers' files with `python profiler.py merge`.
+    """
+    token = os.environ.get('PROFILE_TOKEN', app.config.get('PROFILE_TOKEN'))
+    continuous_hz = float(os.environ.get('PROFILE_CONTINUOUS_HZ', app.config.get('PROFILE_CONTINUOUS_HZ', 0)))
+    continuous = {'pid': None}
+    continuous_lock = threading.Lock()
+
+    def start_continuous():
+        # Threads do not survive a fork, so each worker starts its own; the
+        # lock stops concurrent first requests from starting two samplers
+        with continuous_lock:
+            if continuous['pid'] == os.getpid():
+                return
+            continuous['pid'] = os.getpid()
+            StackSampler(
+                1.0 / continuous_hz,
+                flush_path=os.path.join(PROFILE_DIR, f"continuous-{os.getpid()}.collapsed")
+            ).start()
+        logger.info(f"Continuous profiling at {continuous_hz:g}Hz in process {os.getpid()}")
+
+    @app.before_request
+    def start_profiling():
+        if continuous_hz > 0 and continuous['pid'] != os.getpid():
+            start_continuous()
+        header = request.headers.get('X-Profile')
+        if token and header and hmac.compare_digest(header, token):
+            g.profiler = StackSampler(REQUEST_INTERVAL, threading.get_ident()).start()
+
+    @app.after_request
+    def stop_profiling(response):
+        sampler = g.pop('profiler', None)
+        if sampler is None:
+            return response
+        sampler.stop()
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S.%f}-{request.endpoint or 'unmatched'}-{os.getpid()}.collapsed"
+        try:
+            write_collapsed(sampler.counts, os.path.join(PROFILE_DIR, name))
+            response.headers['X-Profile-File'] = name
+            logger.info(f"Profiled {request.path}: {sampler.samples} samples written to {name}")
+        except OSError as e:
+            logger.error(f"Failed to write profile for {request.path}: {str(e)}")
+        return response
+
+    @app.teardown_request
+    def discard_profiler(exc):
+        # after_request is skipped when the view raises
+        sampler = g.pop('profiler', None)
+        if sampler is not None:
+            sampler.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merge collapsed-stack profiles')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    merge = subparsers.add_parser('merge', help='sum profiles into one collapsed file')
+    merge.add_argument('paths', nargs='+')
+    merge.add_argument('--output', help='file to write (default: stdout)')
+    args = parser.parse_args()
+
+    merged = merge_profiles(args.paths)
+    if args.output:
+        write_collapsed(merged, args.output)
+    else:
+        for stack, count in merged.most_common():
+            print(f"{stack} {count}")
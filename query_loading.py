@@ -0,0 +1,98 @@
+import logging
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, User, Scenario, ScavengerHuntTask
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LAZY_LOAD_BUDGET = 10
+
+# Eager loads per endpoint and model. Options are built on use because
+# backref attributes only exist once the mappers are configured.
+ROUTE_LOADERS: Dict[str, Dict[type, Callable[[], Tuple]]] = {
+    'profile': {
+        User: lambda: (selectinload(User.characters), selectinload(User.templates))
+    },
+    'view_scenario': {
+        User: lambda: (selectinload(User.characters),)
+    },
+    'submit_task': {
+        ScavengerHuntTask: lambda: (joinedload(ScavengerHuntTask.scenario),)
+    },
+    'scavenger_hunt': {
+        Scenario: lambda: (selectinload(Scenario.tasks),)
+    }
+}
+
+class LazyLoadBudgetExceeded(RuntimeError):
+    """A request lazy-loaded more relationships than its budget allows"""
+
+def loader_options(model: type, endpoint: Optional[str] = None) -> Tuple:
+    """Loader options for model in the given (default: current) endpoint"""
+    if endpoint is None and has_request_context():
+        endpoint = request.endpoint
+    factory = ROUTE_LOADERS.get(endpoint, {}).get(model)
+    return factory() if factory else ()
+
+class _LazyLoads:
+    __slots__ = ('budget', 'strict', 'loads')
+
+    def __init__(self, budget: int, strict: bool):
+        self.budget = budget
+        self.strict = strict
+        self.loads: List[str] = []
+
+_lazy_loads: ContextVar[Optional[_LazyLoads]] = ContextVar('lazy_loads', default=None)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _count_lazy_load(orm_execute_state):
+    tracker = _lazy_loads.get()
+    # lazy_loaded_from raises for non-SELECT statements (ORM update/insert)
+    if tracker is None or not orm_execute_state.is_select:
+        return
+    # and is only set for lazy loads, not selectin/joined eager loads
+    if orm_execute_state.lazy_loaded_from is None:
+        return
+    source = orm_execute_state.lazy_loaded_from.class_.__name__
+    target = orm_execute_state.bind_mapper.class_.__name__ if orm_execute_state.bind_mapper else '?'
+    tracker.loads.append(f"{source}->{target}")
+    if tracker.strict and len(tracker.loads) > tracker.budget:
+        raise LazyLoadBudgetExceeded(
+            f"{request.endpoint}: {len(tracker.loads)} lazy loads exceed the budget of "
+            f"{tracker.budget} ({', '.join(tracker.loads)})"
+        )
+
+def init_app(app) -> None:
+    """
+    Check each request's lazy loads against LAZY_LOAD_BUDGET.
+
+    Over budget, a request logs a warning listing the loaded relationships;
+    with LAZY_LOAD_RAISE (default: on in debug mode) the offending load
+    raises LazyLoadBudgetExceeded instead, so the traceback points at the
+    template or view that triggered it. A budget of 0 or less disables
+    the check.
+    """
+    budget = int(app.config.get('LAZY_LOAD_BUDGET', DEFAULT_LAZY_LOAD_BUDGET))
+    if budget <= 0:
+        return
+
+    @app.before_request
+    def start_lazy_load_tracking():
+        strict = app.config.get('LAZY_LOAD_RAISE', app.debug)
+        g.lazy_loads_token = _lazy_loads.set(_LazyLoads(budget, strict))
+
+    @app.teardown_request
+    def check_lazy_load_budget(exc):
+        token = g.pop('lazy_loads_token', None)
+        if token is None:
+            return
+        tracker = _lazy_loads.get()
+        _lazy_loads.reset(token)
+        if tracker is not None and len(tracker.loads) > budget and not tracker.strict:
+            logger.warning(
+                f"{request.endpoint}: {len(tracker.loads)} lazy loads exceed the budget of "
+                f"{budget} ({', '.join(tracker.loads)})"
+            )
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Optional
+from flask import g, request
+
+logger = logging.getLogger('request_log')
+
+request_id_var: ContextVar[str] = ContextVar('request_id', default='-')
+
+# Endpoints hit often enough that only a sample of successful requests is logged
+HIGH_VOLUME_ENDPOINTS = frozenset({'index', 'scavenger_hunt', 'scavenger_hunt_events'})
+SLOW_REQUEST_MS = 1000.0
+
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message'}
+
+def current_request_id() -> str:
+    """ID of the request being handled, or '-' outside a request"""
+    return request_id_var.get()
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def start_log_listener(handler: logging.Handler) -> logging.handlers.QueueListener:
+    """
+    Route the request logger through a queue.
+
+    Request threads only enqueue records; a listener thread formats and
+    writes them, so slow log output never blocks a response. There is one
+    listener per process: starting another (e.g. when a second app is
+    created) flushes and stops the previous one.
+    """
+    global _listener
+    stop_log_listener()
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    logger.handlers = [queue_handler]
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+@atexit.register
+def stop_log_listener() -> None:
+    """Flush queued records and stop the listener thread, if running"""
+    global _listener
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    _listener = None
+
+def setup_request_logging(app, handler: logging.Handler = None) -> logging.handlers.QueueListener:
+    """
+    Log one structured line per request.
+
+    Request IDs live on flask.g and in a contextvar, never in the session.
+    Static files are not logged, and successful requests to high-volume
+    endpoints are sampled at REQUEST_LOG_SAMPLE_RATE. Errors and slow
+    requests are always logged.
+    """
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+    listener = start_log_listener(handler)
+    sample_rate = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', app.config.get('REQUEST_LOG_SAMPLE_RATE', 0.1)))
+    static_prefix = (app.static_url_path or '/static') + '/'
+
+    @app.before_request
+    def start_request_log():
+        if request.path.startswith(static_prefix):
+            return
+        g.request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex
+        g.request_id_token = request_id_var.set(g.request_id)
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        if not logger.isEnabledFor(logging.INFO):
+            return response
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        if (response.status_code < 400 and duration_ms < SLOW_REQUEST_MS
+                and request.endpoint in HIGH_VOLUME_ENDPOINTS and random.random() >= sample_rate):
+            return response
+        logger.info('request', extra={
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2)
+        })
+        return response
+
+    @app.teardown_request
+    def clear_request_id(exc):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id_var.reset(token)
+
+    return listener
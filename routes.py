@@ -5,16 +5,24 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from flask import (
     render_template, request, redirect, url_for, flash, 
-    current_app, get_flashed_messages, session, abort
+    current_app, get_flashed_messages, session, abort, jsonify, Response
 )
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.exceptions import HTTPException
+from jinja2 import TemplateNotFound
 from sqlalchemy.exc import SQLAlchemyError
 from models import (
     db, User, Character, CharacterTemplate, Scenario, Achievement, 
     ScenarioCompletion, ScavengerHuntTask, TaskSubmission
 )
 from utils import generate_character, generate_character_from_template
+from achievements import complete_scenario_if_done, unlocked_achievements
+import leaderboard
+import live_updates
+import metrics
+from query_loading import loader_options
+from story_store import save_scene, get_scene, latest_scene
+from request_logging import current_request_id
 from story_generator import generate_story_scene
 from photo_verification import save_photo, verify_photo_content, cleanup_old_photos
 
@@ -29,45 +37,89 @@ def handle_database_error(e: SQLAlchemyError, operation: str) -> None:
     db.session.rollback()
     flash(f"An error occurred. Reference ID: {error_id}", 'error')
 
+ERROR_TEMPLATES = frozenset({'403.html', '404.html', '500.html'})
+
+def precompile_templates(app) -> int:
+    """
+    Compile every template once at startup.
+
+    Compiled templates stay in the Jinja environment's template cache, and
+    the names that compiled are recorded so existence checks do not touch
+    the loader. Returns the number of templates compiled.
+    """
+    compiled = set()
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+            compiled.add(name)
+        except Exception as e:
+            logger.error(f"Failed to compile template {name}: {str(e)}")
+    app.extensions['template_names'] = frozenset(compiled)
+    logger.info(f"Precompiled {len(compiled)} templates")
+    return len(compiled)
+
 def verify_template_exists(template_path: str) -> bool:
     """Verify if a template file exists with improved error handling"""
     try:
+        if template_path in current_app.extensions.get('template_names', ()):
+            metrics.cache_hit('template')
+            return True
+        metrics.cache_miss('template')
+
+        # Not seen at startup (e.g. added while developing): ask the loader
         template_loader = current_app.jinja_env.loader
         if not template_loader:
             logger.error("Template loader not initialized")
             return False
             
-        template = template_loader.get_source(current_app.jinja_env, template_path)[0]
+        template_loader.get_source(current_app.jinja_env, template_path)
         logger.debug(f"Template verified successfully: {template_path}")
         return True
     except Exception as e:
         logger.error(f"Error verifying template {template_path}: {str(e)}")
         return False
 
+def error_context() -> Dict[str, Any]:
+    """Reference details shown on error pages"""
+    return {
+        'error_id': str(uuid.uuid4()),
+        'error_path': request.path,
+        'error_referrer': request.referrer,
+        'timestamp': datetime.utcnow()
+    }
+
 def render_template_safe(template_name: str, **context) -> str:
     """Safe template rendering with enhanced error handling and logging"""
+    base_context = {}
     try:
         base_context = {
             'get_flashed_messages': get_flashed_messages,
             'url_for': url_for,
             'current_user': current_user,
-            'config': current_app.config,
-            'error_id': str(uuid.uuid4()),
-            'error_path': request.path,
-            'error_referrer': request.referrer,
-            'timestamp': datetime.utcnow()
+            'config': current_app.config
         }
+        if template_name in ERROR_TEMPLATES:
+            base_context.update(error_context())
         base_context.update(context)
 
-        if not verify_template_exists(template_name):
+        # In production templates are fixed at deploy time, so a missing
+        # one surfaces as TemplateNotFound from the render itself
+        if not current_app.config.get('PRODUCTION') and not verify_template_exists(template_name):
             logger.error(f"Template not found: {template_name}")
-            return render_template('500.html', error_message="Template not found", **base_context)
+            return render_template('500.html', **{
+                **base_context, **error_context(), 'error_message': "Template not found"
+            })
 
         return render_template(template_name, **base_context)
+    except TemplateNotFound as e:
+        logger.error(f"Template not found: {str(e)}")
+        return render_template('500.html', **{
+            **base_context, **error_context(), 'error_message': "Template not found"
+        })
     except Exception as e:
-        error_id = str(uuid.uuid4())
-        logger.error(f"Template rendering error: {str(e)} (Error ID: {error_id})")
-        return render_template('500.html', error_id=error_id, error_message=str(e), **base_context)
+        error = error_context()
+        logger.error(f"Template rendering error: {str(e)} (Error ID: {error['error_id']})")
+        return render_template('500.html', **{**base_context, **error, 'error_message': str(e)})
 
 def register_routes(app):
     """Register all application routes with improved error handling"""
@@ -88,7 +140,9 @@ def register_routes(app):
             ('/generate_story/<int:char_id>/<int:scenario_id>', 'generate_story', generate_story, ['GET']),
             ('/view_story/<int:char_id>/<int:scenario_id>', 'view_story', view_story, ['GET']),
             ('/scavenger_hunt/<int:scenario_id>', 'scavenger_hunt', scavenger_hunt, ['GET']),
-            ('/submit_task/<int:task_id>', 'submit_task', submit_task, ['POST'])
+            ('/scavenger_hunt/<int:scenario_id>/events', 'scavenger_hunt_events', scavenger_hunt_events, ['GET']),
+            ('/submit_task/<int:task_id>', 'submit_task', submit_task, ['POST']),
+            ('/leaderboard', 'view_leaderboard', view_leaderboard, ['GET'])
         ]
         
         for path, endpoint, handler, methods in routes:
@@ -112,6 +166,8 @@ def register_routes(app):
         def handle_http_error(e):
             return render_template_safe('500.html', error=str(e)), e.code
         
+        precompile_templates(app)
+
         logger.info("Route registration completed successfully")
         return app
         
@@ -338,10 +394,11 @@ def view_scenario():
     try:
         scenarios = Scenario.query.all()
         completions = ScenarioCompletion.query.filter_by(user_id=current_user.id).all()
-        achievements = Achievement.query.filter_by(user_id=current_user.id).all()
+        achievements = unlocked_achievements(current_user.id)
         
         return render_template_safe('scenario.html', 
                                 scenarios=scenarios, 
+                                characters=current_user.characters,
                                 completions=completions,
                                 achievements=achievements)
     except SQLAlchemyError as e:
@@ -363,7 +420,9 @@ def generate_story(char_id, scenario_id):
             abort(403)
         
         story_scene = generate_story_scene(character, scenario)
-        session['current_story'] = story_scene
+        scene = save_scene(current_user.id, char_id, scenario_id, story_scene)
+        session['current_story_id'] = scene['id']
+        session.pop('current_story', None)
         
         return redirect(url_for('view_story', char_id=char_id, scenario_id=scenario_id))
     except Exception as e:
@@ -381,15 +440,25 @@ def view_story(char_id, scenario_id):
         if character.user_id != current_user.id:
             abort(403)
         
-        story_scene = session.get('current_story')
-        if not story_scene:
-            story_scene = generate_story_scene(character, scenario)
-            session['current_story'] = story_scene
+        # The session only remembers the last generated scene; it may belong
+        # to another character or scenario
+        scene = None
+        scene_id = session.get('current_story_id')
+        if scene_id is not None:
+            scene = get_scene(scene_id)
+        if scene is None or (scene['user_id'], scene['character_id'], scene['scenario_id']) != (
+                current_user.id, char_id, scenario_id):
+            scene = latest_scene(current_user.id, char_id, scenario_id)
+        if scene is None:
+            scene = save_scene(current_user.id, char_id, scenario_id,
+                               generate_story_scene(character, scenario))
+        if scene['id'] != scene_id:
+            session['current_story_id'] = scene['id']
             
         return render_template_safe('story.html',
                                 character=character,
                                 scenario=scenario,
-                                story=story_scene)
+                                story=scene['content'])
     except Exception as e:
         logger.error(f"Error viewing story: {str(e)}")
         flash('Failed to load story.', 'error')
@@ -399,38 +468,75 @@ def view_story(char_id, scenario_id):
 def scavenger_hunt(scenario_id):
     """Handle scavenger hunt view with error handling"""
     try:
-        scenario = Scenario.query.get_or_404(scenario_id)
-        tasks = ScavengerHuntTask.query.filter_by(scenario_id=scenario_id).all()
-        
-        for task in tasks:
-            task.submissions = TaskSubmission.query.filter_by(
-                task_id=task.id,
-                user_id=current_user.id
-            ).order_by(TaskSubmission.submitted_at.desc()).all()
+        scenario = Scenario.query.options(*loader_options(Scenario)).get_or_404(scenario_id)
+        tasks = scenario.tasks
+
+        # One query for the user's submissions to every task; assigning to
+        # task.submissions would rewrite the relationship itself
+        submissions = {task.id: [] for task in tasks}
+        for submission in TaskSubmission.query.filter(
+            TaskSubmission.task_id.in_(list(submissions)),
+            TaskSubmission.user_id == current_user.id
+        ).order_by(TaskSubmission.submitted_at.desc()):
+            submissions[submission.task_id].append(submission)
         
         return render_template_safe('scavenger_hunt.html',
                                 scenario=scenario,
-                                tasks=tasks)
+                                tasks=tasks,
+                                submissions=submissions)
     except Exception as e:
         logger.error(f"Error viewing scavenger hunt: {str(e)}")
         flash('Failed to load scavenger hunt.', 'error')
         return redirect(url_for('view_scenario'))
 
+def wants_json() -> bool:
+    """True for fetch/XHR clients that asked for JSON instead of a redirect"""
+    return request.accept_mimetypes.best == 'application/json'
+
+def task_state(task_id: int) -> Dict[str, Any]:
+    """Scenario-wide state of a task, as pushed to live subscribers"""
+    completed_by = db.session.query(
+        db.func.count(db.func.distinct(TaskSubmission.user_id))
+    ).filter(TaskSubmission.task_id == task_id, TaskSubmission.is_verified.is_(True)).scalar()
+    return {'task_id': task_id, 'completed_by': completed_by}
+
+def submission_state(submission: TaskSubmission) -> Dict[str, Any]:
+    """A user's submission result, as pushed to their own connections"""
+    return {
+        'task_id': submission.task_id,
+        'verified': bool(submission.is_verified),
+        'confidence': submission.confidence_score,
+        'photo_url': url_for('static', filename=submission.photo_path.replace('static/', ''))
+    }
+
 @login_required
 def submit_task(task_id):
     """Handle task submission with comprehensive error handling"""
+    messages = []
+
+    def respond(status: int = 200, **data):
+        """JSON for live clients, flash + redirect for plain form posts"""
+        if wants_json():
+            return jsonify(messages=[{'text': t, 'category': c} for t, c in messages], **data), status
+        for text, category in messages:
+            flash(text, category)
+        return redirect(url_for('scavenger_hunt', scenario_id=task.scenario_id))
+
     try:
-        task = ScavengerHuntTask.query.get_or_404(task_id)
+        task = ScavengerHuntTask.query.options(
+            *loader_options(ScavengerHuntTask)
+        ).get_or_404(task_id)
         
         if 'photo' not in request.files:
-            flash('No photo uploaded', 'error')
-            return redirect(url_for('scavenger_hunt', scenario_id=task.scenario_id))
+            messages.append(('No photo uploaded', 'error'))
+            return respond(400)
         
         photo = request.files['photo']
         if not photo.filename:
-            flash('No photo selected', 'error')
-            return redirect(url_for('scavenger_hunt', scenario_id=task.scenario_id))
+            messages.append(('No photo selected', 'error'))
+            return respond(400)
         
+        result = {}
         try:
             photo_path = save_photo(photo)
             if not photo_path:
@@ -444,6 +550,11 @@ def submit_task(task_id):
                 task.required_location
             )
             
+            # Points are credited once per task; re-verifying a task earns nothing
+            first_verification = is_verified and db.session.query(TaskSubmission.id).filter_by(
+                task_id=task.id, user_id=current_user.id, is_verified=True
+            ).first() is None
+
             submission = TaskSubmission(
                 task_id=task.id,
                 user_id=current_user.id,
@@ -453,22 +564,103 @@ def submit_task(task_id):
             )
             
             db.session.add(submission)
+            if first_verification:
+                leaderboard.add_points(current_user.id, task.points or 0, [
+                    leaderboard.GLOBAL_SCOPE, leaderboard.scenario_scope(task.scenario_id)
+                ])
             db.session.commit()
+
+            result['submission'] = submission_state(submission)
+            live_updates.broker.publish(
+                task.scenario_id, 'submission', task.id, result['submission'],
+                user_id=current_user.id
+            )
             
             if is_verified:
-                flash('Task completed successfully!', 'success')
+                messages.append(('Task completed successfully!', 'success'))
+                live_updates.broker.publish(task.scenario_id, 'task', task.id, task_state(task.id))
+                unlocked = complete_scenario_if_done(
+                    current_user.id, task.scenario, current_request_id()
+                )
+                if unlocked is not None:
+                    messages.append((f'Scenario complete: {task.scenario.title}!', 'success'))
+                for achievement in unlocked or []:
+                    messages.append((f'Achievement unlocked: {achievement.name}', 'success'))
             else:
-                flash('Photo verification failed. Please try again.', 'warning')
+                messages.append(('Photo verification failed. Please try again.', 'warning'))
                 
         except Exception as e:
             logger.error(f"Error processing photo submission: {str(e)}")
-            flash('Error processing photo submission. Please try again.', 'error')
+            messages.append(('Error processing photo submission. Please try again.', 'error'))
             
         cleanup_old_photos()
         
-        return redirect(url_for('scavenger_hunt', scenario_id=task.scenario_id))
+        return respond(**result)
         
     except Exception as e:
         logger.error(f"Error submitting task: {str(e)}")
+        if wants_json():
+            return jsonify(messages=[{'text': 'Failed to submit task.', 'category': 'error'}]), 500
         flash('Failed to submit task.', 'error')
-        return redirect(url_for('view_scenario'))
\ No newline at end of file
+        return redirect(url_for('view_scenario'))
+
+@login_required
+def scavenger_hunt_events(scenario_id):
+    """Server-sent event stream of task updates for a scenario"""
+    try:
+        Scenario.query.get_or_404(scenario_id)
+        tasks = ScavengerHuntTask.query.filter_by(scenario_id=scenario_id).all()
+        latest = {}
+        for submission in TaskSubmission.query.filter(
+            TaskSubmission.task_id.in_([task.id for task in tasks]),
+            TaskSubmission.user_id == current_user.id
+        ).order_by(TaskSubmission.submitted_at):
+            latest[submission.task_id] = submission_state(submission)
+        snapshot = {
+            'tasks': [task_state(task.id) for task in tasks],
+            'submissions': list(latest.values())
+        }
+        # Release the pooled connection before the long-lived stream starts
+        db.session.remove()
+
+        subscription = live_updates.broker.subscribe(scenario_id, current_user.id)
+        response = Response(
+            live_updates.stream_updates(subscription, snapshot),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        # Also covers clients that disconnect before the first chunk is sent
+        response.call_on_close(subscription.close)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error opening live updates for scenario {scenario_id}: {str(e)}")
+        abort(500)
+
+@login_required
+def view_leaderboard():
+    """Show the top players overall or for one scenario, plus the user's own rank"""
+    try:
+        scenario_id = request.args.get('scenario_id', type=int)
+        scenario = Scenario.query.get_or_404(scenario_id) if scenario_id else None
+        scope = leaderboard.scenario_scope(scenario_id) if scenario else leaderboard.GLOBAL_SCOPE
+
+        entries = leaderboard.top(scope, n=20)
+        usernames = dict(db.session.query(User.id, User.username).filter(
+            User.id.in_([entry['user_id'] for entry in entries])
+        ).all()) if entries else {}
+        for entry in entries:
+            entry['username'] = usernames.get(entry['user_id'], 'Unknown')
+
+        return render_template_safe('leaderboard.html',
+                                scenario=scenario,
+                                entries=entries,
+                                user_rank=leaderboard.rank(current_user.id, scope))
+    except SQLAlchemyError as e:
+        handle_database_error(e, "leaderboard view")
+        return redirect(url_for('index'))
+    except Exception as e:
+        logger.error(f"Error viewing leaderboard: {str(e)}")
+        flash('Failed to load leaderboard.', 'error')
+        return redirect(url_for('index'))
@@ -1,12 +1,15 @@
 import os
-import aiohttp
 import asyncio
 import json
-import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from pathlib import Path
 from datetime import datetime
 from aiohttp import ClientSession
+from .context_budget import ContextBudget
+from .http_pool import HTTPClientPool, get_http_pool
+from .log_sink import AsyncLogSink, get_log_sink
+from .rate_limiter import SingleFlight, TokenBucket
+from .streaming import StreamMetrics, StreamTiming, iter_sse
 
 
 class APIHandler:
@@ -20,30 +23,49 @@ class APIHandler:
 
         # Rate limiting settings
         self.rate_limit = self.config.get("rate_limit", 60)  # requests per minute
-        self.request_history: List[float] = []
+        self.rate_limiter = TokenBucket(
+            rate=self.rate_limit / 60, capacity=self.rate_limit
+        )
+
+        # Identical prompts already in flight share one upstream request
+        self.single_flight = SingleFlight()
 
         # Retry settings
         self.max_retries = 3
         self.retry_delay = 1  # seconds
 
-        # Initialize session pool
+        # Requests go through the process-wide connection pool; auth headers
+        # are sent per request since the underlying session is shared
+        self.pool: HTTPClientPool = get_http_pool(self.config.get("pool"))
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
         self.session: Optional[ClientSession] = None
 
+        # Bounded prompt context: rolling summary plus the last few turns
+        self.context_budget = ContextBudget(
+            self.config.get("context"), model=self.config["models"]["default"]
+        )
+
+        # Time-to-first-token and tokens/sec of streamed completions
+        self.stream_metrics = StreamMetrics()
+
+        # API interaction log, written in batches off the event loop
+        self.log_sink: AsyncLogSink = get_log_sink(
+            Path(__file__).parent / "logs" / "api_interactions.jsonl",
+            self.config.get("logging"),
+        )
+
     async def initialize(self) -> None:
         """Initialize the API handler"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession(
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                }
-            )
+        self.session = self.pool.session()
 
     async def close(self) -> None:
-        """Close the API session"""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        """Release this handler; pooled connections stay open for other users"""
+        self.session = None
+        # The writer holds a batch for up to flush_interval; don't lose it
+        await self.log_sink.flush()
 
     def _load_config(self) -> dict:
         """Load API configuration from file"""
@@ -60,34 +82,66 @@ class APIHandler:
                     "chat": "/chat/completions",
                 },
                 "models": {"default": "gpt-3.5-turbo", "advanced": "gpt-4"},
+                "pool": {
+                    "limit": 100,
+                    "limit_per_host": 32,
+                    "keepalive_timeout": 30,
+                    "dns_cache_ttl": 300,
+                },
+                "context": {
+                    "max_context_tokens": 1500,
+                    "recent_turns": 6,
+                    "summary_tokens": 300,
+                    "context_tokens": 200,
+                },
+                "logging": {
+                    "max_queue": 10000,
+                    "batch_size": 256,
+                    "flush_interval": 1.0,
+                    "max_bytes": 10485760,
+                    "rotate_interval": 86400,
+                    "backup_count": 5,
+                    "policy": "drop",
+                },
             }
 
-    def _check_rate_limit(self) -> bool:
-        """Check if we're within rate limits"""
-        current_time = time.time()
-        # Remove requests older than 1 minute
-        self.request_history = [
-            t for t in self.request_history if current_time - t < 60
-        ]
-
-        return len(self.request_history) < self.rate_limit
-
     async def _make_request(
-        self, endpoint: str, payload: Dict, method: str = "POST"
+        self,
+        endpoint: str,
+        payload: Dict,
+        method: str = "POST",
+        session_id: Optional[str] = None,
+        priority: str = "story",
+    ) -> Dict:
+        """Make HTTP request, sharing the response with identical in-flight calls"""
+        key = (method, endpoint, json.dumps(payload, sort_keys=True))
+        return await self.single_flight.do(
+            key,
+            lambda: self._send_with_retries(
+                endpoint, payload, method, session_id, priority
+            ),
+        )
+
+    async def _send_with_retries(
+        self,
+        endpoint: str,
+        payload: Dict,
+        method: str,
+        session_id: Optional[str],
+        priority: str,
     ) -> Dict:
         """Make HTTP request with retry logic"""
-        if self.session is None:
-            await self.initialize()
+        await self.initialize()
 
         for attempt in range(self.max_retries):
             try:
-                if not self._check_rate_limit():
-                    raise Exception("Rate limit exceeded")
-
-                self.request_history.append(time.time())
+                await self.rate_limiter.acquire(session_id, priority)
 
                 async with self.session.request(
-                    method, f"{self.base_url}{endpoint}", json=payload
+                    method,
+                    f"{self.base_url}{endpoint}",
+                    json=payload,
+                    headers=self.headers,
                 ) as response:
                     if response.status == 429:  # Too Many Requests
                         retry_after = int(
@@ -106,45 +160,158 @@ class APIHandler:
 
         raise Exception("Max retries exceeded")
 
-    async def generate_story_content(
-        self, prompt: str, context: Optional[Dict] = None
+    async def _stream_request(
+        self,
+        endpoint: str,
+        payload: Dict,
+        session_id: Optional[str] = None,
+        priority: str = "story",
+    ) -> AsyncIterator[Dict]:
+        """
+        Make a streaming HTTP request, yielding SSE chunks as they arrive
+
+        Retries only happen before the first chunk. Closing the iterator
+        (or cancelling its consumer) closes the response right away.
+        """
+        await self.initialize()
+
+        for attempt in range(self.max_retries):
+            await self.rate_limiter.acquire(session_id, priority)
+            try:
+                response = await self.session.request(
+                    "POST",
+                    f"{self.base_url}{endpoint}",
+                    json={**payload, "stream": True},
+                    headers=self.headers,
+                )
+            except Exception:
+                if attempt == self.max_retries - 1:
+                    raise
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+                continue
+
+            async with response:
+                if response.status == 429:  # Too Many Requests
+                    retry_after = int(
+                        response.headers.get("Retry-After", self.retry_delay)
+                    )
+                    await asyncio.sleep(retry_after)
+                    continue
+
+                response.raise_for_status()
+                async for chunk in iter_sse(response.content):
+                    yield chunk
+                return
+
+        raise Exception("Max retries exceeded")
+
+    def _story_payload(
+        self, prompt: str, context: Optional[Dict], session_id: Optional[str]
     ) -> Dict:
-        """Generate story content using AI model"""
-        payload = {
+        return {
             "model": self.config["models"]["default"],
             "messages": [
                 {"role": "system", "content": "You are a creative storyteller."},
+                *self.context_budget.build_messages(session_id, context),
                 {"role": "user", "content": prompt},
             ],
             "temperature": 0.7,
             "max_tokens": 500,
         }
 
-        if context:
-            payload["messages"].insert(
-                1,
-                {
-                    "role": "system",
-                    "content": f"Previous context: {json.dumps(context)}",
-                },
-            )
+    async def generate_story_content(
+        self,
+        prompt: str,
+        context: Optional[Dict] = None,
+        session_id: Optional[str] = None,
+    ) -> Dict:
+        """
+        Generate story content using AI model
+
+        With a session_id, earlier turns of the session are sent as a rolling
+        summary plus the most recent turns, within the context token budget.
+        """
+        payload = self._story_payload(prompt, context, session_id)
 
         try:
             response = await self._make_request(
-                self.config["endpoints"]["chat"], payload
+                self.config["endpoints"]["chat"], payload, session_id=session_id
             )
+            content = response["choices"][0]["message"]["content"]
+            if session_id is not None:
+                self.context_budget.add_turn(session_id, "user", prompt)
+                self.context_budget.add_turn(session_id, "assistant", content)
 
+            await self.log_api_interaction(
+                self.config["endpoints"]["chat"],
+                True,
+                {"session_id": session_id, "tokens": response["usage"]["total_tokens"]},
+            )
             return {
-                "content": response["choices"][0]["message"]["content"],
+                "content": content,
                 "tokens_used": response["usage"]["total_tokens"],
                 "model": response["model"],
             }
 
         except Exception as e:
+            await self.log_api_interaction(
+                self.config["endpoints"]["chat"],
+                False,
+                {"session_id": session_id, "error": str(e)},
+            )
             return {"error": str(e), "content": None}
 
+    async def generate_story_stream(
+        self,
+        prompt: str,
+        context: Optional[Dict] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream story content as it is generated
+
+        Yields text deltas. When the consumer stops early, the upstream
+        request is closed and the turn is not added to the session context.
+        """
+        endpoint = self.config["endpoints"]["chat"]
+        payload = self._story_payload(prompt, context, session_id)
+        timing = StreamTiming()
+        parts = []
+        try:
+            async for chunk in self._stream_request(
+                endpoint, payload, session_id=session_id
+            ):
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    timing.on_token()
+                    parts.append(delta)
+                    yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            timing.cancelled = True
+            raise
+        except Exception as e:
+            timing.failed = True
+            await self.log_api_interaction(
+                endpoint, False, {"session_id": session_id, "error": str(e)}
+            )
+            raise
+        finally:
+            self.stream_metrics.record(timing)
+
+        content = "".join(parts)
+        if session_id is not None:
+            self.context_budget.add_turn(session_id, "user", prompt)
+            self.context_budget.add_turn(session_id, "assistant", content)
+        await self.log_api_interaction(
+            endpoint, True, {"session_id": session_id, **timing.to_dict()}
+        )
+
     async def analyze_user_input(
-        self, user_input: str, context: Optional[Dict] = None
+        self,
+        user_input: str,
+        context: Optional[Dict] = None,
+        session_id: Optional[str] = None,
     ) -> Dict:
         """Analyze user input for sentiment and intent"""
         payload = {
@@ -160,28 +327,44 @@ class APIHandler:
 
         try:
             response = await self._make_request(
-                self.config["endpoints"]["chat"], payload
+                self.config["endpoints"]["chat"],
+                payload,
+                session_id=session_id,
+                priority="analysis",
             )
 
+            await self.log_api_interaction(
+                self.config["endpoints"]["chat"],
+                True,
+                {"session_id": session_id, "tokens": response["usage"]["total_tokens"]},
+            )
             return {
                 "analysis": response["choices"][0]["message"]["content"],
                 "tokens_used": response["usage"]["total_tokens"],
             }
 
         except Exception as e:
+            await self.log_api_interaction(
+                self.config["endpoints"]["chat"],
+                False,
+                {"session_id": session_id, "error": str(e)},
+            )
             return {"error": str(e), "analysis": None}
 
-    def log_api_interaction(self, endpoint: str, success: bool, details: Dict) -> None:
-        """Log API interactions for monitoring"""
+    async def log_api_interaction(
+        self, endpoint: str, success: bool, details: Dict
+    ) -> bool:
+        """
+        Log API interactions for monitoring
+
+        The record is queued for the background writer. When the queue is
+        full it is dropped under the "drop" policy, or this waits for room
+        under "block". Returns whether it was queued.
+        """
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "endpoint": endpoint,
             "success": success,
             "details": details,
         }
-
-        log_path = Path(__file__).parent / "logs" / "api_interactions.jsonl"
-        log_path.parent.mkdir(exist_ok=True)
-
-        with open(log_path, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        return await self.log_sink.put(log_entry)
@@ -0,0 +1,183 @@
+import json
+import re
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency; fall back to an approximate count
+    tiktoken = None
+
+DEFAULT_BUDGET_CONFIG = {
+    "max_context_tokens": 1500,  # summary + recent turns + extra context
+    "recent_turns": 6,  # turns always sent verbatim
+    "fold_batch": 4,  # turns folded into the summary at a time
+    "summary_tokens": 300,  # cap on the rolling summary
+    "context_tokens": 200,  # cap on the caller-supplied context dict
+    "max_sessions": 1024,  # sessions whose state is kept in memory
+}
+
+# Roughly one token per word piece or punctuation mark, the same granularity
+# BPE tokenizers land on for English prose
+_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Count tokens locally, exactly with tiktoken or approximately without"""
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+@dataclass
+class Turn:
+    role: str
+    content: str
+    tokens: int
+
+
+@dataclass
+class SessionContext:
+    """Rolling summary plus recent turns for one session"""
+
+    turns: Deque[Turn] = field(default_factory=deque)
+    summary_lines: Deque[Turn] = field(default_factory=deque)
+    summary_tokens: int = 0
+    prefix: Optional[Dict[str, str]] = None  # cached summary message
+    prefix_tokens: int = 0
+
+
+class ContextBudget:
+    """
+    Keeps the prompt sent per turn bounded as a session grows.
+
+    Each session keeps at least its last ``recent_turns`` turns verbatim.
+    Older turns are folded into a rolling summary ``fold_batch`` at a time,
+    one short line per turn, and the oldest lines are dropped once the
+    summary reaches its token cap. The summary message is cached and only
+    rebuilt when a batch is folded in, so between folds every request shares
+    the same prefix and only the new turns are added.
+    """
+
+    def __init__(
+        self, config: Optional[Dict[str, Any]] = None, model: str = "gpt-3.5-turbo"
+    ) -> None:
+        config = {**DEFAULT_BUDGET_CONFIG, **(config or {})}
+        self.max_context_tokens = config["max_context_tokens"]
+        self.recent_turns = config["recent_turns"]
+        self.fold_batch = max(1, config["fold_batch"])
+        self.summary_tokens = config["summary_tokens"]
+        self.context_tokens = config["context_tokens"]
+        self.max_sessions = config["max_sessions"]
+        self.model = model
+        self._sessions: "OrderedDict[str, SessionContext]" = OrderedDict()
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def _session(self, session_id: str) -> SessionContext:
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = SessionContext()
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return state
+
+    def add_turn(self, session_id: str, role: str, content: str) -> None:
+        """Record a turn, folding the oldest batch into the summary when due"""
+        state = self._session(session_id)
+        state.turns.append(Turn(role, content, self.count(content)))
+        if len(state.turns) >= self.recent_turns + self.fold_batch:
+            for _ in range(self.fold_batch):
+                self._fold(state, state.turns.popleft())
+            state.prefix = None
+
+    def _fold(self, state: SessionContext, turn: Turn) -> None:
+        line = f"{turn.role}: {self._first_sentence(turn.content)}"
+        tokens = self.count(line)
+        state.summary_lines.append(Turn(turn.role, line, tokens))
+        state.summary_tokens += tokens
+        while state.summary_tokens > self.summary_tokens and state.summary_lines:
+            state.summary_tokens -= state.summary_lines.popleft().tokens
+
+    @staticmethod
+    def _first_sentence(text: str, limit: int = 200) -> str:
+        sentence = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+        return sentence if len(sentence) <= limit else sentence[:limit] + "..."
+
+    def summary_message(self, session_id: str) -> Optional[Dict[str, str]]:
+        """The cached summary prefix for a session, if anything was folded"""
+        state = self._session(session_id)
+        if state.prefix is None and state.summary_lines:
+            content = "Story so far:\n" + "\n".join(
+                line.content for line in state.summary_lines
+            )
+            state.prefix = {"role": "system", "content": content}
+            state.prefix_tokens = self.count(content)
+        return state.prefix
+
+    def context_message(self, context: Dict) -> Dict[str, str]:
+        """Render caller context, truncated to its token cap"""
+        text = json.dumps(context, separators=(",", ":"))
+        if self.count(text) > self.context_tokens:
+            text = self._truncate(text, self.context_tokens)
+        return {"role": "system", "content": f"Previous context: {text}"}
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        # Binary search on characters keeps this exact for either tokenizer
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count(text[:mid]) <= tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low] + "..."
+
+    def build_messages(
+        self, session_id: Optional[str], context: Optional[Dict] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Messages to send before the new user prompt: summary, context and as
+        many recent turns as fit in the budget (newest first).
+        """
+        messages = []
+        budget = self.max_context_tokens
+
+        if session_id is not None:
+            prefix = self.summary_message(session_id)
+            if prefix is not None:
+                messages.append(prefix)
+                budget -= self._sessions[session_id].prefix_tokens
+
+        if context:
+            context_message = self.context_message(context)
+            messages.append(context_message)
+            budget -= self.count(context_message["content"])
+
+        if session_id is not None:
+            recent = []
+            for turn in reversed(self._sessions[session_id].turns):
+                if turn.tokens > budget:
+                    break
+                budget -= turn.tokens
+                recent.append({"role": turn.role, "content": turn.content})
+            messages.extend(reversed(recent))
+
+        return messages
+
+    def forget(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
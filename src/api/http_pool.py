@@ -0,0 +1,165 @@
+import asyncio
+import inspect
+import socket
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientSession, TCPConnector, TraceConfig
+
+DEFAULT_POOL_CONFIG = {
+    "limit": 100,  # total open connections
+    "limit_per_host": 32,
+    "keepalive_timeout": 30,  # seconds an idle connection is kept for reuse
+    "dns_cache_ttl": 300,  # seconds
+    "tcp_nodelay": True,
+}
+
+_SUPPORTS_SOCKET_FACTORY = (
+    "socket_factory" in inspect.signature(TCPConnector.__init__).parameters
+)
+
+
+def _socket_factory(addr_info) -> socket.socket:
+    """Create client sockets with Nagle disabled and TCP keep-alive probes on"""
+    family, type_, proto, _, _ = addr_info
+    sock = socket.socket(family=family, type=type_, proto=proto)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+class HTTPClientPool:
+    """
+    Process-wide pooled aiohttp client.
+
+    All APIHandler instances share one ClientSession, so concurrent requests
+    reuse warm keep-alive connections and cached DNS lookups instead of each
+    handler paying for its own handshakes.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
+        self.config = {**DEFAULT_POOL_CONFIG, **(config or {})}
+        self._session: Optional[ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "queued": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+
+    def _trace_config(self) -> TraceConfig:
+        stats = self._stats
+        trace = TraceConfig()
+
+        def counter(name: str, delta: int = 1):
+            async def hook(session, ctx, params) -> None:
+                stats[name] += delta
+
+            return hook
+
+        trace.on_request_start.append(counter("requests"))
+        trace.on_request_start.append(counter("in_flight"))
+        trace.on_request_end.append(counter("in_flight", -1))
+        trace.on_request_exception.append(counter("in_flight", -1))
+        trace.on_connection_create_end.append(counter("connections_created"))
+        trace.on_connection_reuseconn.append(counter("connections_reused"))
+        trace.on_connection_queued_start.append(counter("queued"))
+        trace.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        return trace
+
+    def _create_session(self) -> ClientSession:
+        connector_args = dict(
+            limit=self.config["limit"],
+            limit_per_host=self.config["limit_per_host"],
+            keepalive_timeout=self.config["keepalive_timeout"],
+            use_dns_cache=True,
+            ttl_dns_cache=self.config["dns_cache_ttl"],
+        )
+        if self.config["tcp_nodelay"] and _SUPPORTS_SOCKET_FACTORY:
+            connector_args["socket_factory"] = _socket_factory
+
+        return ClientSession(
+            connector=TCPConnector(**connector_args),
+            trace_configs=[self._trace_config()],
+        )
+
+    async def startup(self) -> ClientSession:
+        """Create the shared session on the running loop"""
+        return self.session()
+
+    def session(self) -> ClientSession:
+        """Get the shared session, creating it on first use in this loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._discard_session()
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    def _discard_session(self) -> None:
+        """Close a session bound to another event loop before replacing it"""
+        session, loop = self._session, self._loop
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            # close() cannot be awaited without its loop; drop the pooled
+            # transports directly (a no-op once that loop is closed)
+            session.connector._close()
+
+    async def shutdown(self) -> None:
+        """Close the shared session and all pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Pool utilization counters"""
+        metrics = dict(self._stats)
+        metrics["limit"] = self.config["limit"]
+        metrics["limit_per_host"] = self.config["limit_per_host"]
+        metrics["utilization"] = self._stats["in_flight"] / self.config["limit"]
+        connections = metrics["connections_created"] + metrics["connections_reused"]
+        metrics["reuse_ratio"] = (
+            metrics["connections_reused"] / connections if connections else 0.0
+        )
+        return metrics
+
+
+_pool: Optional[HTTPClientPool] = None
+_owners = 0
+
+
+def get_http_pool(config: Optional[Dict[str, Any]] = None) -> HTTPClientPool:
+    """Get the process-wide pool; config only applies when it is first created"""
+    global _pool
+    if _pool is None:
+        _pool = HTTPClientPool(config)
+    return _pool
+
+
+async def startup_http_pool(config: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Startup hook: open the shared pool before serving requests
+
+    Each call registers one owner; the pool stays open until every owner
+    has called shutdown_http_pool().
+    """
+    global _owners
+    await get_http_pool(config).startup()
+    _owners += 1
+
+
+async def shutdown_http_pool() -> None:
+    """Shutdown hook: release one owner, closing pooled connections at zero"""
+    global _owners
+    _owners = max(_owners - 1, 0)
+    if _owners == 0 and _pool is not None:
+        await _pool.shutdown()
@@ -0,0 +1,222 @@
+"""
+Open-loop load generator for APIHandler and RolePlayEngine.
+
+Requests are started on a fixed schedule at the target QPS regardless of
+how long earlier ones take, so a slow backend shows up as growing latency
+and errors rather than as a lower request rate.
+
+    python -m src.api.load_generator --target api --qps 50 --duration 10 \\
+        --latency lognormal:0.05:0.5 --error-429 0.05
+    python -m src.api.load_generator --target engine --qps 20 --users 10
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+Target = Callable[[int], Awaitable[Any]]
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LoadReport:
+    """Latency percentiles and error rates of one load run"""
+
+    def __init__(
+        self, latencies: List[float], errors: Counter, duration: float
+    ) -> None:
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.duration = duration
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors.values()) / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "achieved_qps": self.requests / self.duration if self.duration else 0.0,
+            "p50": percentile(self.latencies, 50),
+            "p95": percentile(self.latencies, 95),
+            "p99": percentile(self.latencies, 99),
+            "max": self.latencies[-1] if self.latencies else None,
+            "error_rate": self.error_rate,
+            "errors": dict(self.errors),
+        }
+
+
+async def run_load(
+    target: Target, qps: float, duration: float, max_concurrency: int = 1000
+) -> LoadReport:
+    """
+    Call ``target(i)`` at ``qps`` for ``duration`` seconds.
+
+    A call counts as an error if it raises or returns a dict with an "error"
+    key (the APIHandler convention). At most ``max_concurrency`` calls are in
+    flight; later arrivals wait, and that wait counts towards their latency.
+    """
+    latencies: List[float] = []
+    errors: Counter = Counter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def one(i: int, scheduled: float) -> None:
+        async with semaphore:
+            try:
+                result = await target(i)
+                if isinstance(result, dict) and result.get("error"):
+                    errors[str(result["error"])[:80]] += 1
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            finally:
+                latencies.append(time.perf_counter() - scheduled)
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    tasks = []
+    for i in range(int(qps * duration)):
+        scheduled = start + i / qps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(loop.create_task(one(i, scheduled)))
+
+    await asyncio.gather(*tasks)
+    return LoadReport(latencies, errors, time.perf_counter() - start)
+
+
+def api_target(handler, stream: bool = False) -> Target:
+    """Drive APIHandler.generate_story_content (or its streaming variant)"""
+
+    async def call(i: int) -> Any:
+        prompt = f"Continue story {i}"
+        if not stream:
+            return await handler.generate_story_content(prompt, session_id=str(i))
+        async for _ in handler.generate_story_stream(prompt, session_id=str(i)):
+            pass
+
+    return call
+
+
+def default_users(qps: float, duration: float, requests_per_user: int = 10) -> int:
+    """Virtual users for a run, so each makes several requests and plays on"""
+    return max(1, int(qps * duration) // requests_per_user)
+
+
+def engine_target(engine, users: int = 100) -> Target:
+    """
+    Drive RolePlayEngine: users start sessions and walk the story graph
+
+    Choices go through process_choice_stream, so with an api_handler every
+    step is narrated by the API. Each virtual user makes one request at a
+    time (later arrivals wait for it, counted in their latency) and ends a
+    finished session before playing again.
+    """
+    locks: Dict[str, asyncio.Lock] = {}
+
+    async def play(user_id: str, i: int) -> Any:
+        session = engine.session_manager.get_current_session(user_id)
+        if session is not None:
+            node = (session.get("story_state") or {}).get("current_node") or "start"
+            options = engine.story_generator.get_valid_choices(node)
+            if options:
+                choice = options[i % len(options)]["id"]
+                async for event in engine.process_choice_stream(user_id, choice):
+                    pass
+                return event
+            # Reached an ending: close it out and play again
+            engine.session_manager.end_session(session["session_id"])
+        return await engine.start_session(user_id)
+
+    async def call(i: int) -> Any:
+        user_id = f"load_user_{i % users}"
+        lock = locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            return await play(user_id, i)
+
+    return call
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    from .api_handler import APIHandler
+    from .log_sink import shutdown_log_sinks
+    from .mock_llm_server import MockLLMServer
+
+    server = MockLLMServer(
+        {
+            "latency": args.latency,
+            "error_rate_429": args.error_429,
+            "error_rate_500": args.error_500,
+        }
+    )
+    os.environ["API_BASE_URL"] = await server.start()
+    handler = APIHandler()
+    handler.rate_limiter.rate = handler.rate_limiter.capacity = args.qps * 2
+    handler.retry_delay = 0.05
+    engine = None
+    session_directory = tempfile.TemporaryDirectory()
+    try:
+        if args.target == "engine":
+            from src.backend.role_play_engine import RolePlayEngine
+            from src.backend.session_manager import SessionManager
+
+            engine = RolePlayEngine(
+                session_manager=SessionManager(Path(session_directory.name)),
+                api_handler=handler,
+            )
+            users = args.users or default_users(args.qps, args.duration)
+            target = engine_target(engine, users)
+        else:
+            target = api_target(handler, stream=args.target == "stream")
+        report = await run_load(target, args.qps, args.duration)
+    finally:
+        if engine is not None:
+            await engine.close()
+        await handler.close()
+        await shutdown_log_sinks()
+        await handler.pool.shutdown()
+        await server.stop()
+        session_directory.cleanup()
+
+    return {**report.to_dict(), "server": server.stats}
+
+
+def main() -> None:
+    from .mock_llm_server import parse_latency
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=["api", "stream", "engine"], default="api")
+    parser.add_argument("--qps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument(
+        "--users",
+        type=int,
+        help="virtual users for --target engine (default: one per 10 requests)",
+    )
+    parser.add_argument("--latency", type=parse_latency, default="lognormal:0.05:0.5")
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(_main(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SINK_CONFIG = {
+    "max_queue": 10000,
+    "batch_size": 256,
+    "flush_interval": 1.0,  # seconds
+    "max_bytes": 10 * 1024 * 1024,
+    "rotate_interval": 24 * 60 * 60,  # seconds
+    "backup_count": 5,
+    "policy": "drop",  # or "block"
+}
+
+# Queued by flush() to end the writer's current batch early
+_FLUSH: Any = object()
+
+
+class AsyncLogSink:
+    """
+    Buffered JSONL sink that keeps disk writes off the event loop.
+
+    Records go into a bounded queue and a background task writes them in
+    batches from a worker thread. When the queue is full, records are dropped
+    (and counted) under the "drop" policy, or put() waits for room under
+    "block". The file rotates when it exceeds max_bytes or is older than
+    rotate_interval seconds, keeping backup_count old files.
+    """
+
+    def __init__(self, path: Path, config: Optional[Dict[str, Any]] = None) -> None:
+        config = {**DEFAULT_SINK_CONFIG, **(config or {})}
+        if config["policy"] not in ("drop", "block"):
+            raise ValueError(f"Unknown backpressure policy: {config['policy']}")
+
+        self.path = Path(path)
+        self.max_queue = config["max_queue"]
+        self.batch_size = config["batch_size"]
+        self.flush_interval = config["flush_interval"]
+        self.max_bytes = config["max_bytes"]
+        self.rotate_interval = config["rotate_interval"]
+        self.backup_count = config["backup_count"]
+        self.policy = config["policy"]
+
+        self.dropped = 0
+        self.written = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._opened_at: Optional[float] = None
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done() or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._writer = loop.create_task(self._run())
+            self._loop = loop
+        return self._queue
+
+    def emit(self, record: Dict[str, Any]) -> bool:
+        """
+        Queue a record without waiting; returns False if it was dropped
+
+        Outside a running event loop there is no writer task, so the record
+        is written synchronously instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            try:
+                self._write_batch([record])
+                return True
+            except Exception as e:
+                print(f"Error writing log record to {self.path}: {e}")
+                self.dropped += 1
+                return False
+        try:
+            self._ensure_started().put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def put(self, record: Dict[str, Any]) -> bool:
+        """Queue a record, waiting for room when the policy is "block" """
+        if self.policy == "drop":
+            return self.emit(record)
+        await self._ensure_started().put(record)
+        return True
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _FLUSH:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+            records = [record for record in batch if record is not _FLUSH]
+            try:
+                if records:
+                    await asyncio.to_thread(self._write_batch, records)
+            except Exception as e:
+                print(f"Error writing {len(records)} log records to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(record) + "\n" for record in batch)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._should_rotate(len(data)):
+            self._rotate()
+        with open(self.path, "a") as f:
+            f.write(data)
+        self.written += len(batch)
+
+    def _should_rotate(self, incoming: int) -> bool:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._opened_at = time.time()
+            return False
+        if self._opened_at is None:
+            self._opened_at = stat.st_mtime
+        if stat.st_size and stat.st_size + incoming > self.max_bytes:
+            return True
+        return time.time() - self._opened_at > self.rotate_interval
+
+    def _rotate(self) -> None:
+        for i in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{i}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._opened_at = time.time()
+
+    async def flush(self) -> None:
+        """Wait until everything queued so far is on disk"""
+        if self._queue is None or self._writer is None or self._writer.done():
+            return
+        if self._loop is not asyncio.get_running_loop():
+            return  # the writer belongs to a loop that is no longer ours
+        # Wake the writer so it writes its pending batch now, not after
+        # flush_interval
+        await self._queue.put(_FLUSH)
+        await self._queue.join()
+
+    async def close(self) -> None:
+        """Flush queued records and stop the writer"""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+
+_sinks: Dict[Path, AsyncLogSink] = {}
+
+
+def get_log_sink(path: Path, config: Optional[Dict[str, Any]] = None) -> AsyncLogSink:
+    """Get the process-wide sink for a file; config only applies on creation"""
+    path = Path(path).resolve()
+    if path not in _sinks:
+        _sinks[path] = AsyncLogSink(path, config)
+    return _sinks[path]
+
+
+async def flush_log_sinks() -> None:
+    """Wait until every sink has written what was queued so far"""
+    for sink in list(_sinks.values()):
+        await sink.flush()
+
+
+async def shutdown_log_sinks() -> None:
+    """Shutdown hook: flush and stop every sink"""
+    for sink in list(_sinks.values()):
+        await sink.close()
@@ -0,0 +1,193 @@
+"""
+Local OpenAI-compatible mock server for exercising the API layer.
+
+Serves /chat/completions and /completions with configurable latency,
+injected 429/500 errors and SSE streaming, so APIHandler's retries, rate
+limiting and connection pooling can be tested without a real provider.
+
+    python -m src.api.mock_llm_server --port 8089 --latency lognormal:0.05:0.5 \\
+        --error-429 0.05 --error-500 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+DEFAULT_MOCK_CONFIG = {
+    # name plus parameters, see sample_latency
+    "latency": {"distribution": "fixed", "value": 0.0},
+    "error_rate_429": 0.0,
+    "error_rate_500": 0.0,
+    "retry_after": 0,  # seconds sent in Retry-After with a 429
+    "tokens_per_second": 200.0,  # pacing of streamed chunks
+    "reply_words": 24,
+    "seed": None,
+}
+
+
+def sample_latency(spec: Dict[str, Any], rng: random.Random) -> float:
+    """Draw one latency in seconds from a distribution spec"""
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "fixed":
+        value = spec.get("value", 0.0)
+    elif distribution == "uniform":
+        value = rng.uniform(spec["low"], spec["high"])
+    elif distribution == "normal":
+        value = rng.gauss(spec["mean"], spec["stddev"])
+    elif distribution == "lognormal":
+        # Parameterised by the median, which is what latency SLOs talk about
+        value = spec["median"] * rng.lognormvariate(0.0, spec["sigma"])
+    elif distribution == "exponential":
+        value = rng.expovariate(1.0 / spec["mean"]) if spec["mean"] > 0 else 0.0
+    else:
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+    return max(0.0, value)
+
+
+def parse_latency(text: str) -> Dict[str, Any]:
+    """Parse "lognormal:0.05:0.5"-style command line latency specs"""
+    name, *params = text.split(":")
+    names = {
+        "fixed": ["value"],
+        "uniform": ["low", "high"],
+        "normal": ["mean", "stddev"],
+        "lognormal": ["median", "sigma"],
+        "exponential": ["mean"],
+    }
+    if name not in names or len(params) != len(names[name]):
+        raise ValueError(f"Invalid latency spec: {text}")
+    return {"distribution": name, **dict(zip(names[name], map(float, params)))}
+
+
+class MockLLMServer:
+    """aiohttp app answering like an OpenAI-compatible completion API"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
+        self.config = {**DEFAULT_MOCK_CONFIG, **(config or {})}
+        self.rng = random.Random(self.config["seed"])
+        self.stats = {
+            "requests": 0,
+            "streams": 0,
+            "errors_429": 0,
+            "errors_500": 0,
+            "disconnects": 0,
+        }
+        self.app = web.Application()
+        self.app.router.add_post("/chat/completions", self.handle_completion)
+        self.app.router.add_post("/completions", self.handle_completion)
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    def _reply(self, body: Dict[str, Any]) -> str:
+        messages = body.get("messages") or [{"content": body.get("prompt", "")}]
+        prompt = str(messages[-1].get("content", ""))
+        words = [f"word{i}" for i in range(self.config["reply_words"])]
+        return f"Mock reply to: {prompt[:80]} " + " ".join(words)
+
+    async def handle_completion(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(sample_latency(self.config["latency"], self.rng))
+
+        roll = self.rng.random()
+        if roll < self.config["error_rate_429"]:
+            self.stats["errors_429"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit exceeded"}},
+                status=429,
+                headers={"Retry-After": str(self.config["retry_after"])},
+            )
+        if roll < self.config["error_rate_429"] + self.config["error_rate_500"]:
+            self.stats["errors_500"] += 1
+            return web.json_response(
+                {"error": {"message": "Internal server error"}}, status=500
+            )
+
+        content = self._reply(body)
+        if body.get("stream"):
+            return await self._stream(request, body, content)
+
+        return web.json_response(
+            {
+                "id": f"mock-{self.stats['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"total_tokens": len(content.split())},
+            }
+        )
+
+    async def _stream(
+        self, request: web.Request, body: Dict[str, Any], content: str
+    ) -> web.StreamResponse:
+        self.stats["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        delay = 1.0 / self.config["tokens_per_second"]
+        try:
+            for word in content.split(" "):
+                chunk = {
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": {"content": word + " "}}],
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(delay)
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            self.stats["disconnects"] += 1
+            raise
+        return response
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=parse_latency, default="fixed:0")
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        {
+            "latency": args.latency,
+            "error_rate_429": args.error_429,
+            "error_rate_500": args.error_500,
+            "tokens_per_second": args.tokens_per_second,
+            "seed": args.seed,
+        }
+    )
+    web.run_app(server.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Sequence
+
+
+class TokenBucket:
+    """
+    Async token bucket that callers await instead of failing on bursts.
+
+    Waiters are served by priority class first (in the order given by
+    ``priorities``), then round-robin across sessions within a class, so one
+    busy session cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        priorities: Sequence[str] = ("story", "analysis"),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.priorities = tuple(priorities)
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._queues: Dict[str, "OrderedDict[Hashable, Deque[asyncio.Future]]"] = {
+            priority: OrderedDict() for priority in self.priorities
+        }
+        self._waiting = 0
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(
+        self, session_id: Optional[Hashable] = None, priority: str = "story"
+    ) -> None:
+        """Wait until a request may be sent"""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        self._refill()
+        if not self._waiting and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(session_id, deque()).append(future)
+        self._waiting += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the next live waiter by priority, then session round-robin"""
+        for priority in self.priorities:
+            sessions = self._queues[priority]
+            while sessions:
+                session_id, waiters = next(iter(sessions.items()))
+                future = waiters.popleft()
+                self._waiting -= 1
+                if waiters:
+                    sessions.move_to_end(session_id)
+                else:
+                    del sessions[session_id]
+                if not future.done():
+                    return future
+        return None
+
+    async def _dispatch(self) -> None:
+        while self._waiting:
+            self._refill()
+            while self._tokens >= 1:
+                future = self._next_waiter()
+                if future is None:
+                    return
+                self._tokens -= 1
+                future.set_result(None)
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SingleFlight:
+    """Collapse identical in-flight calls into one shared upstream call"""
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``call`` unless an identical call is running; share its result"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # A cancelled caller must not cancel the request others are awaiting
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
@@ -0,0 +1,106 @@
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from aiohttp import StreamReader
+
+
+async def iter_sse(content: StreamReader) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Parse an OpenAI-style server-sent event stream into JSON chunks.
+
+    Only ``data:`` fields are read; the stream ends at ``data: [DONE]``.
+    Multi-line events are joined as the SSE spec describes.
+    """
+    data_lines = []
+    async for raw in content:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip(" "))
+            continue
+        if line or not data_lines:
+            continue  # comments, other fields, or keep-alive blank lines
+
+        data = "\n".join(data_lines)
+        data_lines = []
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
+    if data_lines and data_lines != ["[DONE]"]:
+        yield json.loads("\n".join(data_lines))
+
+
+@dataclass
+class StreamTiming:
+    """Latency of one streamed completion"""
+
+    started: float = field(default_factory=time.perf_counter)
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    tokens: int = 0
+    cancelled: bool = False
+    failed: bool = False
+
+    def on_token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.tokens += 1
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds until the first token arrived"""
+        if self.first_token is None:
+            return None
+        return self.first_token - self.started
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        """Generation rate after the first token"""
+        if self.first_token is None or self.finished is None:
+            return None
+        elapsed = self.finished - self.first_token
+        return (self.tokens - 1) / elapsed if elapsed > 0 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ttft": self.ttft,
+            "tokens": self.tokens,
+            "tokens_per_sec": self.tokens_per_sec,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+        }
+
+
+class StreamMetrics:
+    """Recent stream timings and their summary"""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.timings: Deque[StreamTiming] = deque(maxlen=window)
+        self.completed = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    def record(self, timing: StreamTiming) -> None:
+        timing.finished = time.perf_counter()
+        self.timings.append(timing)
+        if timing.cancelled:
+            self.cancelled += 1
+        elif timing.failed:
+            self.errors += 1
+        else:
+            self.completed += 1
+
+    def summary(self) -> Dict[str, Any]:
+        ttfts = sorted(t.ttft for t in self.timings if t.ttft is not None)
+        rates = [t.tokens_per_sec for t in self.timings if t.tokens_per_sec]
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "ttft_p50": ttfts[len(ttfts) // 2] if ttfts else None,
+            "ttft_p95": ttfts[int(len(ttfts) * 0.95)] if ttfts else None,
+            "tokens_per_sec": sum(rates) / len(rates) if rates else None,
+        }
@@ -2,6 +2,7 @@ from .story_generator import StoryGenerator
 from .session_manager import SessionManager
 from .response_handler import ResponseHandler
 from ..api.api_handler import APIHandler
+from ..api.http_pool import shutdown_http_pool, startup_http_pool
 
 
 class RolePlayAssistant:
@@ -10,6 +11,21 @@ class RolePlayAssistant:
         self.session_manager = SessionManager()
         self.response_handler = ResponseHandler()
         self.api_handler = APIHandler()
+        self._owns_http_pool = False
+
+    async def initialize(self) -> None:
+        """Open the shared HTTP pool before serving sessions"""
+        if not self._owns_http_pool:
+            await startup_http_pool()
+            self._owns_http_pool = True
+        await self.api_handler.initialize()
+
+    async def close(self) -> None:
+        """Release the API handler and this assistant's hold on the pool"""
+        await self.api_handler.close()
+        if self._owns_http_pool:
+            await shutdown_http_pool()
+            self._owns_http_pool = False
 
     async def start_session(self, user_id: str) -> dict:
         """Start new roleplay session"""
@@ -1,6 +1,9 @@
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, FrozenSet, Optional, Union, List, Tuple
 from datetime import datetime
+from functools import lru_cache
+from string import Formatter
 import json
+import time
 from pathlib import Path
 from enum import Enum
 
@@ -14,9 +17,88 @@ class ResponseType(Enum):
     PROMPT = "prompt"
 
 
+# Data fields the format_* helpers supply for each built-in response type
+RESPONSE_FIELDS: Dict[str, FrozenSet[str]] = {
+    ResponseType.ERROR.value: frozenset({"message"}),
+    ResponseType.SUCCESS.value: frozenset({"message"}),
+    ResponseType.STORY.value: frozenset({"content", "choices"}),
+    ResponseType.CHOICE.value: frozenset({"choice"}),
+    ResponseType.SYSTEM.value: frozenset({"message"}),
+    ResponseType.PROMPT.value: frozenset({"options"}),
+}
+
+
+def _json_escape(value: Any) -> bytes:
+    """Encode a value as the inside of a JSON string literal"""
+    return json.dumps(str(value))[1:-1].encode()
+
+
+@lru_cache(maxsize=1024)
+def _format_choice_block(texts: Tuple[str, ...]) -> str:
+    return "\n".join(f"{i+1}. {text}" for i, text in enumerate(texts))
+
+
+class CompiledResponseTemplate:
+    """A response template parsed once into literal text and field slots"""
+
+    def __init__(self, response_type: str, template: str):
+        self.response_type = response_type
+        self.template = template
+        self.parts: List[Tuple[str, Optional[str]]] = []
+        simple = True
+
+        try:
+            parsed = list(Formatter().parse(template))
+        except ValueError as e:
+            raise ValueError(f"Invalid template for '{response_type}': {e}") from e
+
+        fields = set()
+        for literal, field, format_spec, conversion in parsed:
+            if field is None:
+                self.parts.append((literal, None))
+                continue
+            name = field.split(".", 1)[0].split("[", 1)[0]
+            if not name or name.isdigit():
+                raise ValueError(
+                    f"Template for '{response_type}' uses positional field {{{field}}}"
+                )
+            if field != name or format_spec or conversion:
+                simple = False
+            fields.add(name)
+            self.parts.append((literal, name))
+
+        self.fields: FrozenSet[str] = frozenset(fields)
+
+        # Attribute/index lookups and format specs keep str.format semantics
+        self._simple = simple
+        self._json_parts = [
+            (_json_escape(literal), name) for literal, name in self.parts
+        ]
+
+    def render(self, data: Dict[str, Any]) -> str:
+        if not self._simple:
+            return self.template.format(**data)
+        return "".join(
+            [
+                literal + str(data[name]) if name else literal
+                for literal, name in self.parts
+            ]
+        )
+
+    def render_json(self, data: Dict[str, Any]) -> bytes:
+        """Render straight into the escaped body of a JSON string"""
+        if not self._simple:
+            return _json_escape(self.template.format(**data))
+        return b"".join(
+            [
+                literal + _json_escape(data[name]) if name else literal
+                for literal, name in self._json_parts
+            ]
+        )
+
+
 class ResponseHandler:
     def __init__(self):
-        self.templates = self._load_templates()
         self.fallback_templates = {
             ResponseType.ERROR.value: "An error occurred: {message}",
             ResponseType.SUCCESS.value: "{message}",
@@ -25,6 +107,10 @@ class ResponseHandler:
             ResponseType.SYSTEM.value: "System: {message}",
             ResponseType.PROMPT.value: "What would you like to do?\n{options}",
         }
+        self.templates = self._load_templates()
+        self.compiled = self._compile_templates()
+        self._timestamp_second = -1
+        self._timestamp = ""
 
     def _load_templates(self) -> Dict[str, str]:
         """Load response templates from configuration file"""
@@ -35,6 +121,48 @@ class ResponseHandler:
         except FileNotFoundError:
             return self.fallback_templates
 
+    def _compile_templates(self) -> Dict[str, CompiledResponseTemplate]:
+        """
+        Compile configured templates over the fallbacks
+
+        Raises ValueError if a built-in response type's template uses a field
+        its format_* helper never supplies.
+        """
+        compiled = {}
+        for response_type, template in {
+            **self.fallback_templates,
+            **self.templates,
+        }.items():
+            entry = CompiledResponseTemplate(response_type, template)
+            allowed = RESPONSE_FIELDS.get(response_type)
+            if allowed is not None and not entry.fields <= allowed:
+                unknown = ", ".join(sorted(entry.fields - allowed))
+                raise ValueError(
+                    f"Template for '{response_type}' uses unknown fields: {unknown}"
+                )
+            compiled[response_type] = entry
+        return compiled
+
+    def _now(self) -> str:
+        """Current timestamp, formatted at most once per second"""
+        now = time.time()
+        second = int(now)
+        if second != self._timestamp_second:
+            self._timestamp_second = second
+            self._timestamp = datetime.fromtimestamp(second).isoformat()
+        return self._timestamp
+
+    def _get_compiled(
+        self, response_type: Union[ResponseType, str]
+    ) -> CompiledResponseTemplate:
+        if isinstance(response_type, ResponseType):
+            response_type = response_type.value
+
+        compiled = self.compiled.get(response_type)
+        if compiled is None:
+            raise ValueError(f"Unknown response type: {response_type}")
+        return compiled
+
     def format_response(
         self,
         response_type: Union[ResponseType, str],
@@ -42,46 +170,84 @@ class ResponseHandler:
         metadata: Optional[Dict] = None,
     ) -> Dict[str, Any]:
         """Format response using appropriate template"""
-        if isinstance(response_type, ResponseType):
-            response_type = response_type.value
+        compiled = self._get_compiled(response_type)
 
-        template = self.templates.get(
-            response_type, self.fallback_templates.get(response_type)
-        )
+        if not compiled.fields <= data.keys():
+            missing = ", ".join(sorted(compiled.fields - data.keys()))
+            return self.format_error(f"Missing required data field: {missing}")
 
-        if not template:
-            raise ValueError(f"Unknown response type: {response_type}")
+        response = {
+            "type": compiled.response_type,
+            "content": compiled.render(data),
+            "timestamp": self._now(),
+        }
 
-        try:
-            formatted_content = template.format(**data)
+        if metadata:
+            response["metadata"] = metadata
 
-            response = {
-                "type": response_type,
-                "content": formatted_content,
-                "timestamp": datetime.now().isoformat(),
-            }
+        return response
 
-            if metadata:
-                response["metadata"] = metadata
+    def format_response_json(
+        self,
+        response_type: Union[ResponseType, str],
+        data: Dict[str, Any],
+        metadata: Optional[Dict] = None,
+    ) -> bytes:
+        """
+        Format a response directly into a serialized JSON payload
+
+        Produces the same document as json.dumps(format_response(...)) without
+        building the intermediate dict.
+        """
+        compiled = self._get_compiled(response_type)
 
-            return response
+        if not compiled.fields <= data.keys():
+            missing = ", ".join(sorted(compiled.fields - data.keys()))
+            return json.dumps(
+                self.format_error(f"Missing required data field: {missing}")
+            ).encode()
 
-        except KeyError as e:
-            return self.format_error(f"Missing required data field: {e}")
-        except Exception as e:
-            return self.format_error(f"Error formatting response: {e}")
+        payload = [
+            b'{"type": "',
+            _json_escape(compiled.response_type),
+            b'", "content": "',
+            compiled.render_json(data),
+            b'", "timestamp": "',
+            self._now().encode(),
+            b'"',
+        ]
+        if metadata:
+            payload.append(b', "metadata": ')
+            payload.append(json.dumps(metadata).encode())
+        payload.append(b"}")
+        return b"".join(payload)
 
     def format_story_response(
         self, story_content: str, choices: List[Dict[str, str]]
     ) -> Dict[str, Any]:
         """Format a story response with choices"""
-        formatted_choices = "\n".join(
-            f"{i+1}. {choice['text']}" for i, choice in enumerate(choices)
+        return self.format_response(
+            ResponseType.STORY,
+            {
+                "content": story_content,
+                "choices": _format_choice_block(tuple(c["text"] for c in choices)),
+            },
+            metadata={
+                "choice_count": len(choices),
+                "choice_ids": [choice.get("id") for choice in choices],
+            },
         )
 
-        return self.format_response(
+    def format_story_response_json(
+        self, story_content: str, choices: List[Dict[str, str]]
+    ) -> bytes:
+        """Format a story response with choices as a JSON payload"""
+        return self.format_response_json(
             ResponseType.STORY,
-            {"content": story_content, "choices": formatted_choices},
+            {
+                "content": story_content,
+                "choices": _format_choice_block(tuple(c["text"] for c in choices)),
+            },
             metadata={
                 "choice_count": len(choices),
                 "choice_ids": [choice.get("id") for choice in choices],
@@ -1,31 +1,63 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
 from src.backend.session_manager import SessionManager
 from src.backend.response_handler import ResponseHandler
-from src.backend.story_generator import StoryGenerator
-import datetime
+from src.backend.story_generator import StoryCursor, StoryGenerator
+from src.api.http_pool import shutdown_http_pool, startup_http_pool
+from src.api.log_sink import flush_log_sinks
+import asyncio
+import weakref
 
 
 class RolePlayEngine:
-    def __init__(self) -> None:
-        self.sessions: Dict[str, Dict[str, Any]] = {}
-        self.session_manager: SessionManager = SessionManager()
+    def __init__(
+        self,
+        session_manager: Optional[SessionManager] = None,
+        api_handler: Optional[Any] = None,
+    ) -> None:
+        self.session_manager: SessionManager = session_manager or SessionManager()
+        self.api_handler = api_handler  # Optional; used to stream AI narration
         self.response_handler: ResponseHandler = ResponseHandler()
         self.story_generator: StoryGenerator = StoryGenerator()
         self.active = True  # Add an attribute to track if the engine is active
+        self._owns_http_pool = False
+
+        # One lock per session serializes a user's choices; entries disappear
+        # once no coroutine holds or waits on the lock
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    @property
+    def sessions(self) -> Dict[str, Dict[str, Any]]:
+        """Current session per user, read from the SessionManager registry"""
+        return self.session_manager.current_sessions()
 
     async def initialize(self) -> None:
         """Initialize the engine and its components"""
-        # Add initialization logic here
-        pass
+        if self.api_handler is not None and not self._owns_http_pool:
+            # Open the shared HTTP pool before the first narration request
+            await startup_http_pool()
+            self._owns_http_pool = True
+
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        """Get the lock guarding a session's state"""
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
 
     async def start_session(self, user_id: str) -> Dict[str, Any]:
         """Start a new session for a user"""
         session_data: Dict[str, Any] = self.session_manager.create_session(user_id)
-        self.sessions[user_id] = session_data
-        
+
         # Generate initial story segment
         initial_story = await self.story_generator.generate_story_segment({"choice": "start"})
-        
+        cursor = StoryCursor().advance(initial_story.get("current_node", "start"))
+        session_data = self.session_manager.update_session(
+            session_data["session_id"], {"story_state": cursor.to_state()}
+        )
+
         return {
             "status": "success",
             "message": "Session started",
@@ -38,6 +70,9 @@ class RolePlayEngine:
         """
         Process the user's choice and generate the next story segment.
 
+        Choices for the same session are applied one at a time; different
+        sessions proceed in parallel.
+
         Parameters:
         - user_id (str): The identifier of the user.
         - choice (str): The choice made by the user.
@@ -48,16 +83,28 @@ class RolePlayEngine:
         if not self.active:
             raise ValueError("Engine is closed.")
 
-        if user_id not in self.sessions:
+        session = self.session_manager.get_current_session(user_id)
+        if not session:
             raise ValueError("Invalid session ID")
 
-        session = self.sessions[user_id]
-        
-        # Initialize user_choices if it doesn't exist or is empty
-        if not session.get('user_choices'):
-            session['user_choices'] = ['start']
-        
-        last_choice = session['user_choices'][-1]
+        session_id = session['session_id']
+        async with self._session_lock(session_id):
+            cursor, next_segment = await self._next_segment(session, choice)
+
+            # Use .get() method with default value to avoid KeyError
+            story_text = next_segment.get('story_text', 'No story text available')
+            self._record_choice(session_id, cursor, choice, story_text)
+
+        return {
+            'status': 'success',
+            'content': story_text,
+            'choices': next_segment.get('choices', [])
+        }
+
+    async def _next_segment(self, session: Dict[str, Any], choice: str):
+        """Validate a choice against the session's cursor and generate the segment"""
+        cursor = StoryCursor.from_state(session.get('story_state'))
+        last_choice = cursor.current_node or 'start'
 
         # Determine valid choices based on the last choice
         choices_list = self.story_generator.get_valid_choices(last_choice)
@@ -67,17 +114,79 @@ class RolePlayEngine:
             raise ValueError(f"Invalid choice: {choice} after {last_choice}")
 
         # Proceed to generate the next story segment
-        next_segment = await self.story_generator.generate_story_segment({'choice': choice})
-        
-        # Use .get() method with default value to avoid KeyError
+        next_segment = await self.story_generator.generate_story_segment(
+            {'choice': choice}, cursor
+        )
+        return cursor.advance(next_segment.get('current_node', choice)), next_segment
+
+    def _record_choice(
+        self, session_id: str, cursor: StoryCursor, choice: str, story_text: str
+    ) -> None:
+        """Record the choice and its segment in the session event log"""
+        self.session_manager.update_session(
+            session_id, {'story_state': cursor.to_state()}
+        )
+        self.session_manager.add_to_session_history(
+            session_id, {'choice': choice, 'story_text': story_text}
+        )
+
+    async def process_choice_stream(
+        self, user_id: str, choice: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of process_choice.
+
+        Yields {'type': 'token', 'content': ...} events as the segment is
+        narrated, then a final {'type': 'done', ...} event with the full text
+        and the next choices. Without an api_handler the templated segment is
+        sent as a single token. The choice is only recorded once the stream
+        completes, so a client that disconnects can make it again.
+
+        The session lock is held while the choice is validated and while it
+        is recorded, never across a yield, so a slow or abandoned client
+        cannot block the session. A choice whose session moved on while it
+        was being narrated is rejected instead of recorded.
+        """
+        if not self.active:
+            raise ValueError("Engine is closed.")
+
+        session = self.session_manager.get_current_session(user_id)
+        if not session:
+            raise ValueError("Invalid session ID")
+
+        session_id = session['session_id']
+        async with self._session_lock(session_id):
+            recorded = len(session.get('user_choices', []))
+            cursor, next_segment = await self._next_segment(session, choice)
         story_text = next_segment.get('story_text', 'No story text available')
-        
-        # Update session state
-        session['story_text'] = session.get('story_text', '') + "\n" + story_text
-        session['user_choices'].append(choice)
-        session['last_activity'] = datetime.datetime.now().isoformat()
 
-        return {
+        if self.api_handler is None:
+            yield {'type': 'token', 'content': story_text}
+        else:
+            prompt = (
+                f"The player chose '{choice}'. Narrate the next scene, "
+                f"building on this outline: {story_text}"
+            )
+            parts = []
+            stream = self.api_handler.generate_story_stream(
+                prompt, session_id=session_id
+            )
+            try:
+                async for delta in stream:
+                    parts.append(delta)
+                    yield {'type': 'token', 'content': delta}
+            finally:
+                # Close the upstream request even if our consumer stops early
+                await stream.aclose()
+            story_text = "".join(parts) or story_text
+
+        async with self._session_lock(session_id):
+            if len(session.get('user_choices', [])) != recorded:
+                raise ValueError(f"Session advanced while narrating choice: {choice}")
+            self._record_choice(session_id, cursor, choice, story_text)
+
+        yield {
+            'type': 'done',
             'status': 'success',
             'content': story_text,
             'choices': next_segment.get('choices', [])
@@ -85,23 +194,28 @@ class RolePlayEngine:
 
     async def close(self) -> None:
         """Close the engine and clean up sessions"""
-        self.sessions.clear()
+        self.session_manager.close()
+        await flush_log_sinks()
+        if self._owns_http_pool:
+            # Other handlers may still share the pool; release only our hold
+            await shutdown_http_pool()
+            self._owns_http_pool = False
         self.active = False
 
     async def analyze_input(self, user_id: str, input_text: str) -> Dict[str, Any]:
         """
         Analyze user's text input and provide appropriate response.
-        
+
         Parameters:
         - user_id (str): The identifier of the user
         - input_text (str): The text
-        
+
         Returns:
         - Dict[str, Any]: Analysis results and appropriate responses
         """
-        if user_id not in self.sessions:
+        if not self.session_manager.get_current_session(user_id):
             raise ValueError("Invalid session ID")
-        
+
         # Basic analysis implementation
         return {
             "status": "success",
@@ -1,16 +1,48 @@
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List, Tuple
+import heapq
+import time
 import uuid
 import json
+import os
 from pathlib import Path
 
 
 class SessionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        session_directory: Optional[Path] = None,
+        compaction_ratio: float = 1.0,
+        compaction_min_bytes: int = 16 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         self.active_sessions: Dict[str, dict] = {}
         self.session_timeout = timedelta(hours=2)  # Sessions expire after 2 hours
         self.max_sessions_per_user = 3
-        self.session_directory = Path(__file__).parent / "data" / "sessions"
+        self.session_directory = session_directory or (
+            Path(__file__).parent / "data" / "sessions"
+        )
+
+        # Event log state: every change is appended to <id>.log.jsonl and the
+        # log is folded into the <id>.json snapshot once it reaches
+        # compaction_ratio times the snapshot's size (and at least
+        # compaction_min_bytes, so short sessions are not rewritten every few
+        # changes). Snapshots thus grow geometrically, so the bytes written
+        # per change stay constant (amortised) however long the history gets.
+        self.compaction_ratio = compaction_ratio
+        self.compaction_min_bytes = compaction_min_bytes
+        self.bytes_written = 0
+        self._event_seq: Dict[str, int] = {}
+        self._log_bytes: Dict[str, int] = {}
+        self._snapshot_bytes: Dict[str, int] = {}
+
+        # Expiry state: monotonic last-seen times, a min-heap of scheduled
+        # deadlines (lazily rescheduled on pop) and a per-user index
+        self._clock = clock
+        self._last_seen: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._scheduled: Dict[str, float] = {}
+        self._user_index: Dict[str, Dict[str, None]] = {}
 
         # Create sessions directory if it doesn't exist
         self.session_directory.mkdir(parents=True, exist_ok=True)
@@ -24,8 +56,7 @@ class SessionManager:
         self._clean_expired_sessions()
 
         # Check if user has too many active sessions
-        user_sessions = self.get_user_sessions(user_id)
-        if len(user_sessions) >= self.max_sessions_per_user:
+        if len(self._user_index.get(user_id, ())) >= self.max_sessions_per_user:
             raise ValueError(
                 f"User has reached maximum session limit of {self.max_sessions_per_user}"
             )
@@ -43,37 +74,50 @@ class SessionManager:
             "status": "active",
         }
 
-        self.active_sessions[session_id] = session_data
-        self._save_session(session_id, session_data)
+        self._track(session_id, session_data)
+        self._write_snapshot(session_id, session_data)
 
         return session_data
 
     def get_session(self, session_id: str) -> Optional[dict]:
         """Retrieve session by ID"""
+        session = self._get_live_session(session_id)
+        if session:
+            self._update_last_activity(session_id)
+        return session
+
+    def _get_live_session(self, session_id: str) -> Optional[dict]:
+        """Retrieve an unexpired session without recording activity"""
         session = self.active_sessions.get(session_id)
 
-        if not session:
-            # Try to load from disk
-            session = self._load_session(session_id)
-            if session:
-                self.active_sessions[session_id] = session
+        if session:
+            if not self._is_session_expired(session):
+                return session
+            self._untrack(session_id)
+            return None
 
-        if session and not self._is_session_expired(session):
-            self._update_last_activity(session_id)
-            return session
+        # Try to load from disk
+        session = self._load_session(session_id)
+        if session and session.get("status") == "active":
+            idle = datetime.now() - datetime.fromisoformat(session["last_activity"])
+            if idle <= self.session_timeout:
+                self._track(session_id, session, idle.total_seconds())
+                return session
 
         return None
 
     def update_session(self, session_id: str, updates: dict) -> dict:
         """Update session with new data"""
-        session = self.get_session(session_id)
+        session = self._get_live_session(session_id)
         if not session:
             raise ValueError(f"Session {session_id} not found or expired")
 
         session.update(updates)
-        session["last_activity"] = datetime.now().isoformat()
+        timestamp = self._mark_active(session_id, session)
 
-        self._save_session(session_id, session)
+        self._append_event(
+            session_id, session, "update", {"data": updates, "ts": timestamp}
+        )
         return session
 
     def end_session(self, session_id: str) -> bool:
@@ -85,63 +129,219 @@ class SessionManager:
         session["status"] = "completed"
         session["end_time"] = datetime.now().isoformat()
 
-        self._save_session(session_id, session)
-        self.active_sessions.pop(session_id, None)
+        # Archive as a single compacted snapshot
+        self._write_snapshot(session_id, session)
+        self._log_path(session_id).unlink(missing_ok=True)
+        self._untrack(session_id)
 
         return True
 
     def get_user_sessions(self, user_id: str) -> List[dict]:
         """Get all active sessions for a user"""
+        self._clean_expired_sessions()
         return [
-            session
-            for session in self.active_sessions.values()
-            if session["user_id"] == user_id and not self._is_session_expired(session)
+            self.active_sessions[session_id]
+            for session_id in self._user_index.get(user_id, ())
         ]
 
+    def get_current_session(self, user_id: str) -> Optional[dict]:
+        """Get the most recently started active session for a user"""
+        self._clean_expired_sessions()
+        user_sessions = self._user_index.get(user_id)
+        if not user_sessions:
+            return None
+        return self._get_live_session(next(reversed(user_sessions)))
+
+    def current_sessions(self) -> Dict[str, dict]:
+        """Map each user with an active session to their current session"""
+        self._clean_expired_sessions()
+        return {
+            user_id: self.active_sessions[next(reversed(session_ids))]
+            for user_id, session_ids in self._user_index.items()
+        }
+
+    def close(self) -> None:
+        """Drop all in-memory session state; persisted sessions are untouched"""
+        self.active_sessions.clear()
+        self._event_seq.clear()
+        self._log_bytes.clear()
+        self._snapshot_bytes.clear()
+        self._last_seen.clear()
+        self._expiry_heap.clear()
+        self._scheduled.clear()
+        self._user_index.clear()
+
     def _is_session_expired(self, session: dict) -> bool:
         """Check if session has expired"""
-        last_activity = datetime.fromisoformat(session["last_activity"])
-        return datetime.now() - last_activity > self.session_timeout
+        last_seen = self._last_seen.get(session["session_id"])
+        if last_seen is None:
+            last_activity = datetime.fromisoformat(session["last_activity"])
+            return datetime.now() - last_activity > self.session_timeout
+        return self._clock() - last_seen > self.session_timeout.total_seconds()
+
+    def _mark_active(self, session_id: str, session: dict) -> str:
+        """Record activity on a tracked session, returning the ISO timestamp"""
+        self._last_seen[session_id] = self._clock()
+        timestamp = datetime.now().isoformat()
+        session["last_activity"] = timestamp
+        return timestamp
 
     def _update_last_activity(self, session_id: str) -> None:
         """Update last activity timestamp"""
-        if session_id in self.active_sessions:
-            self.active_sessions[session_id][
-                "last_activity"
-            ] = datetime.now().isoformat()
-            self._save_session(session_id, self.active_sessions[session_id])
+        session = self.active_sessions.get(session_id)
+        if session is not None:
+            timestamp = self._mark_active(session_id, session)
+            self._append_event(session_id, session, "touch", {"ts": timestamp})
+
+    def _track(self, session_id: str, session: dict, idle: float = 0.0) -> None:
+        """Register a live session in memory, the expiry heap and the user index"""
+        self.active_sessions[session_id] = session
+        self._last_seen[session_id] = self._clock() - idle
+        self._user_index.setdefault(session["user_id"], {})[session_id] = None
+        if session_id not in self._scheduled:
+            deadline = (
+                self._last_seen[session_id] + self.session_timeout.total_seconds()
+            )
+            self._scheduled[session_id] = deadline
+            heapq.heappush(self._expiry_heap, (deadline, session_id))
+
+    def _untrack(self, session_id: str) -> None:
+        """Drop a session from memory; its heap entry is discarded when popped"""
+        session = self.active_sessions.pop(session_id, None)
+        self._last_seen.pop(session_id, None)
+        self._scheduled.pop(session_id, None)
+        # Rebuilt by _load_session if the session is read back from disk
+        self._event_seq.pop(session_id, None)
+        self._log_bytes.pop(session_id, None)
+        self._snapshot_bytes.pop(session_id, None)
+        if session is not None:
+            user_sessions = self._user_index.get(session["user_id"])
+            if user_sessions is not None:
+                user_sessions.pop(session_id, None)
+                if not user_sessions:
+                    del self._user_index[session["user_id"]]
 
     def _clean_expired_sessions(self) -> None:
         """Remove expired sessions from memory"""
-        expired = [
-            session_id
-            for session_id, session in self.active_sessions.items()
-            if self._is_session_expired(session)
-        ]
+        timeout = self.session_timeout.total_seconds()
+        now = self._clock()
+        heap = self._expiry_heap
+
+        # Only sessions whose deadline has passed are visited; ones that saw
+        # activity since being scheduled are pushed back with a later deadline
+        while heap and heap[0][0] <= now:
+            deadline, session_id = heapq.heappop(heap)
+            if self._scheduled.get(session_id) != deadline:
+                continue
+            new_deadline = self._last_seen[session_id] + timeout
+            if new_deadline <= now:
+                self._untrack(session_id)
+            else:
+                self._scheduled[session_id] = new_deadline
+                heapq.heappush(heap, (new_deadline, session_id))
 
-        for session_id in expired:
-            self.active_sessions.pop(session_id, None)
+    def _snapshot_path(self, session_id: str) -> Path:
+        return self.session_directory / f"{session_id}.json"
 
-    def _save_session(self, session_id: str, session_data: dict) -> None:
-        """Save session data to disk"""
+    def _log_path(self, session_id: str) -> Path:
+        return self.session_directory / f"{session_id}.log.jsonl"
+
+    def _append_event(
+        self, session_id: str, session: dict, op: str, payload: dict
+    ) -> None:
+        """Append one compact record to the session event log"""
+        seq = self._event_seq.get(session_id, 0) + 1
+        record = {"seq": seq, "op": op, **payload}
+        line = json.dumps(record, separators=(",", ":")) + "\n"
         try:
-            file_path = self.session_directory / f"{session_id}.json"
-            with open(file_path, "w") as f:
-                json.dump(session_data, f, indent=2)
+            with open(self._log_path(session_id), "a") as f:
+                f.write(line)
+        except Exception as e:
+            print(f"Error appending event to session {session_id}: {e}")
+            return
+
+        self.bytes_written += len(line)
+        self._event_seq[session_id] = seq
+        log_bytes = self._log_bytes.get(session_id, 0) + len(line)
+        snapshot_bytes = self._snapshot_bytes.get(session_id, 0)
+        if log_bytes >= max(
+            self.compaction_ratio * snapshot_bytes, self.compaction_min_bytes
+        ):
+            self._write_snapshot(session_id, session)
+        else:
+            self._log_bytes[session_id] = log_bytes
+
+    def _write_snapshot(self, session_id: str, session_data: dict) -> None:
+        """Write a full snapshot to disk and compact the event log"""
+        try:
+            seq = self._event_seq.get(session_id, 0)
+            data = json.dumps(dict(session_data, _event_seq=seq), separators=(",", ":"))
+            file_path = self._snapshot_path(session_id)
+            tmp_path = file_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+            self.bytes_written += len(data)
+            self._snapshot_bytes[session_id] = len(data)
+
+            # Records up to seq are now in the snapshot; replay skips them even
+            # if we crash before the log is truncated
+            log_path = self._log_path(session_id)
+            if log_path.exists():
+                log_path.write_text("")
+            self._log_bytes[session_id] = 0
         except Exception as e:
             print(f"Error saving session {session_id}: {e}")
 
     def _load_session(self, session_id: str) -> Optional[dict]:
-        """Load session data from disk"""
+        """Load the last snapshot from disk and replay the event log on top"""
         try:
-            file_path = self.session_directory / f"{session_id}.json"
-            if file_path.exists():
-                with open(file_path, "r") as f:
-                    return json.load(f)
+            file_path = self._snapshot_path(session_id)
+            if not file_path.exists():
+                return None
+
+            with open(file_path, "r") as f:
+                data = f.read()
+            session = json.loads(data)
+            seq = session.pop("_event_seq", 0)
+
+            log_bytes = 0
+            log_path = self._log_path(session_id)
+            if log_path.exists():
+                with open(log_path, "r") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # Torn final write; everything before it is intact
+                            break
+                        if record["seq"] <= seq:
+                            continue
+                        self._apply_event(session, record)
+                        seq = record["seq"]
+                        log_bytes += len(line)
+
+            self._event_seq[session_id] = seq
+            self._log_bytes[session_id] = log_bytes
+            self._snapshot_bytes[session_id] = len(data)
+            return session
         except Exception as e:
             print(f"Error loading session {session_id}: {e}")
         return None
 
+    @staticmethod
+    def _apply_event(session: dict, record: dict) -> None:
+        """Apply a single event log record to session state"""
+        op = record["op"]
+        if op == "choice":
+            session.setdefault("user_choices", []).append(record["event"])
+            session["last_activity"] = record["event"]["timestamp"]
+        elif op == "update":
+            session.update(record["data"])
+            session["last_activity"] = record["ts"]
+        elif op == "touch":
+            session["last_activity"] = record["ts"]
+
     def get_session_history(self, session_id: str) -> List[dict]:
         """Get chronological history of session choices and events"""
         session = self.get_session(session_id)
@@ -151,11 +351,11 @@ class SessionManager:
 
     def add_to_session_history(self, session_id: str, event: dict) -> bool:
         """Add new event to session history"""
-        session = self.get_session(session_id)
+        session = self._get_live_session(session_id)
         if not session:
             return False
 
-        event["timestamp"] = datetime.now().isoformat()
+        event["timestamp"] = self._mark_active(session_id, session)
         session["user_choices"].append(event)
-        self._save_session(session_id, session)
+        self._append_event(session_id, session, "choice", {"event": event})
         return True
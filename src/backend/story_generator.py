@@ -1,45 +1,50 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
 import json
-import os
+import logging
 from pathlib import Path
+from src.backend.story_graph import StoryGraph, StoryNode
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StoryCursor:
+    """Position of a single session in the story"""
+
+    current_node: Optional[str] = None
+
+    @property
+    def started(self) -> bool:
+        return self.current_node is not None
+
+    def advance(self, node: str) -> "StoryCursor":
+        """Return a cursor moved to the given node"""
+        return StoryCursor(current_node=node)
+
+    def to_state(self) -> Dict[str, Any]:
+        """Serialize for storage in a session's story_state"""
+        return {"current_node": self.current_node}
+
+    @classmethod
+    def from_state(cls, state: Optional[Dict[str, Any]]) -> "StoryCursor":
+        """Rebuild a cursor from a session's story_state"""
+        return cls(current_node=(state or {}).get("current_node"))
 
 
 class StoryGenerator:
+    """
+    Stateless story generator shared by all sessions.
+
+    Story content is compiled once into an immutable StoryGraph; each
+    session's position is carried in a StoryCursor passed in by the caller.
+    """
+
     def __init__(self):
         self.prompts = self._load_prompts()
-        self.current_story = None
-        self.story_state = {}
-        self.story_templates = self._load_story_templates()
-        self.story_flow = {
-            "start": {
-                "choices": [
-                    {"id": "investigate", "text": "Investigate further"},
-                    {"id": "retreat", "text": "Retreat carefully"},
-                    {"id": "explore", "text": "Explore the surroundings"}
-                ]
-            },
-            "investigate": {
-                "choices": [
-                    {"id": "continue", "text": "Continue investigating"},
-                    {"id": "hide", "text": "Find a hiding spot"},
-                    {"id": "run", "text": "Run away quickly"}
-                ]
-            },
-            "hide": {
-                "choices": [
-                    {"id": "wait", "text": "Wait and observe"},
-                    {"id": "emerge", "text": "Emerge from hiding"},
-                    {"id": "move_stealthily", "text": "Move stealthily"}
-                ]
-            },
-            "continue": {
-                "choices": [
-                    {"id": "wait", "text": "Wait and observe"},
-                    {"id": "proceed", "text": "Proceed carefully"},
-                    {"id": "retreat", "text": "Retreat"}
-                ]
-            }
-        }
+        self.graph = StoryGraph.compile(self.prompts)
+        for issue in self.graph.validate():
+            logger.warning(f"Story graph: {issue}")
 
     def _load_prompts(self) -> dict:
         """Load story prompts from JSON configuration file"""
@@ -80,46 +85,48 @@ class StoryGenerator:
                         ],
                     },
                 },
+                "story": {
+                    "root": "start",
+                    "nodes": {
+                        "start": {
+                            "prompt": "intro",
+                            "choices": [
+                                {"id": "investigate", "text": "Investigate further"},
+                                {"id": "retreat", "text": "Retreat carefully"},
+                            ],
+                        },
+                        "investigate": {
+                            "prompt": "conflict",
+                            "choices": [{"id": "retreat", "text": "Retreat"}],
+                        },
+                        "retreat": {
+                            "template": "You carefully back away. {consequence}",
+                            "variables": {
+                                "consequence": ["The mystery remains unsolved."]
+                            },
+                            "ending": True,
+                        },
+                    },
+                },
             }
 
-    def _load_story_templates(self) -> dict:
-        """Load story structure templates"""
-        return {
-            "basic": {
-                "intro": self.prompts["intro"],
-                "conflict": self.prompts["conflict"],
-                "choices": [
-                    {"id": "investigate", "text": "Investigate further"},
-                    {"id": "retreat", "text": "Retreat carefully"},
-                    {"id": "explore", "text": "Explore the surroundings"},
-                ],
-            }
-        }
-
-    async def generate_story_segment(self, context: Dict) -> Dict:
+    async def generate_story_segment(
+        self, context: Dict, cursor: Optional[StoryCursor] = None
+    ) -> Dict:
         """
-        Generate next story segment based on context
-        Returns dict containing story text and available choices
+        Generate next story segment based on context and the session's cursor
+        Returns dict containing story text, available choices and the node
+        the cursor should advance to
         """
         try:
             # If this is the start of the story
-            if not self.current_story:
-                template = self.story_templates["basic"]["intro"]
-                story_text = self._generate_from_template(template)
-                choices = self.story_templates["basic"]["choices"]
-
-                self.current_story = {
-                    "current_node": "intro",
-                    "story_text": story_text,
-                    "choices": choices,
-                }
-
-                return self.current_story
+            if cursor is None or not cursor.started:
+                return self._render_node(self.graph.nodes[self.graph.root])
 
             # If continuing existing story
             choice = context.get("choice")
             if choice:
-                return await self._generate_next_segment(choice)
+                return await self._generate_next_segment(cursor, choice)
 
             raise ValueError("No choice provided for story continuation")
 
@@ -129,149 +136,23 @@ class StoryGenerator:
                 "choices": [],
             }
 
-    def _generate_from_template(self, template_data: Dict) -> str:
-        """Generate text from template with random variables"""
-        import random
-
-        base_template = template_data["template"]
-        variables = template_data["variables"]
-
-        # Replace each variable with random choice from its options
-        replacements = {
-            key: random.choice(options) for key, options in variables.items()
+    def _render_node(self, node: StoryNode) -> Dict:
+        """Render a node's template into a story segment"""
+        return {
+            "current_node": node.id,
+            "story_text": node.template.render(),
+            "choices": list(node.choices),
         }
 
-        return base_template.format(**replacements)
-
-    async def _generate_next_segment(self, choice: str) -> Dict:
+    async def _generate_next_segment(self, cursor: StoryCursor, choice: str) -> Dict:
         """Generate next story segment based on player choice"""
-        # Map choices to consequences
-        choice_consequences = {
-            "start": {
-                "template": self.story_templates["basic"]["intro"],
-                "choices": [
-                    {"id": "investigate", "text": "Investigate further"},
-                    {"id": "retreat", "text": "Retreat carefully"},
-                    {"id": "explore", "text": "Explore the surroundings"}
-                ]
-            },
-            "investigate": {
-                "template": self.story_templates["basic"]["conflict"],
-                "choices": [
-                    {"id": "fight", "text": "Stand and fight"},
-                    {"id": "hide", "text": "Find a hiding spot"},
-                    {"id": "run", "text": "Run away quickly"},
-                ],
-            },
-            "retreat": {
-                "template": {
-                    "template": "You carefully back away. {consequence}",
-                    "variables": {
-                        "consequence": [
-                            "The mystery remains unsolved.",
-                            "You hear distant sounds fading.",
-                            "Safety comes at the cost of adventure.",
-                        ]
-                    },
-                },
-                "choices": [
-                    {"id": "return", "text": "Return cautiously"},
-                    {"id": "leave", "text": "Leave the area"},
-                    {"id": "observe", "text": "Observe from afar"},
-                ],
-            },
-            "explore": {
-                "template": {
-                    "template": "You decide to explore the area. {discovery}",
-                    "variables": {
-                        "discovery": [
-                            "You stumble upon a hidden cave.",
-                            "You find a strange artifact on the ground.",
-                            "You notice footprints leading deeper into the forest.",
-                        ]
-                    },
-                },
-                "choices": [
-                    {"id": "enter_cave", "text": "Enter the cave"},
-                    {"id": "examine_artifact", "text": "Examine the artifact"},
-                    {"id": "follow_footprints", "text": "Follow the footprints"},
-                ],
-            },
-            "wait": {
-                "template": {
-                    "template": "You decide to wait. {event}",
-                    "variables": {
-                        "event": [
-                            "Nothing happens for a while.",
-                            "You hear distant sounds approaching.",
-                            "A feeling of unease settles in.",
-                        ]
-                    },
-                },
-                "choices": [
-                    {"id": "investigate", "text": "Investigate the sound"},
-                    {"id": "retreat", "text": "Retreat to a safer place"},
-                    {"id": "stand_guard", "text": "Stand guard and stay alert"},
-                ],
-            },
-            "run": {
-                "template": {
-                    "template": "You run as fast as you can. {outcome}",
-                    "variables": {
-                        "outcome": [
-                            "You escape safely.",
-                            "You stumble but regain your footing.",
-                            "You run into another challenge.",
-                        ]
-                    },
-                },
-                "choices": [
-                    {"id": "rest", "text": "Take a moment to rest"},
-                    {"id": "continue_running", "text": "Keep running"},
-                    {"id": "hide", "text": "Find a place to hide"},
-                ],
-            },
-            "hide": {
-                "template": {
-                    "template": "You find a hiding spot. {event}",
-                    "variables": {
-                        "event": [
-                            "You wait until it's safe.",
-                            "You overhear something interesting.",
-                            "You realize you're not alone.",
-                        ]
-                    },
-                },
-                "choices": [
-                    {"id": "emerge", "text": "Emerge from hiding"},
-                    {"id": "stay_hidden", "text": "Stay hidden longer"},
-                    {"id": "move_stealthily", "text": "Move stealthily"},
-                ],
-            },
-        }
-
-        if choice not in choice_consequences:
-            raise ValueError(f"Invalid choice: {choice}")
-
-        consequence = choice_consequences[choice]
-        story_text = self._generate_from_template(consequence["template"])
-
-        self.current_story = {
-            "current_node": choice,
-            "story_text": story_text,
-            "choices": consequence["choices"],
-        }
-
-        return self.current_story
+        return self._render_node(self.graph.transition(cursor.current_node, choice))
 
     def get_initial_choices(self) -> List[Dict[str, str]]:
         """Get initial choices for a new story"""
-        return [
-            {"id": "explore", "text": "Explore the surroundings"},
-            {"id": "talk", "text": "Talk to someone nearby"},
-            {"id": "wait", "text": "Wait and observe"},
-        ]
+        return list(self.graph.nodes[self.graph.root].choices)
 
     def get_valid_choices(self, last_choice: str) -> List[Dict[str, str]]:
         """Get valid choices based on the last choice made"""
-        return self.story_flow.get(last_choice, {}).get("choices", [])
+        node = self.graph.get(last_choice)
+        return list(node.choices) if node else []
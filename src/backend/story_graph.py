@@ -0,0 +1,148 @@
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+from dataclasses import dataclass
+from string import Formatter
+from types import MappingProxyType
+import random
+
+
+class StoryGraphError(ValueError):
+    """Raised when story content cannot be compiled into a valid graph"""
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A format template split once into literal text and variable options"""
+
+    parts: Tuple[Tuple[str, Optional[Tuple[str, ...]]], ...]
+
+    @classmethod
+    def compile(cls, template_data: Dict[str, Any], where: str) -> "CompiledTemplate":
+        """Parse a {"template", "variables"} entry, checking every field exists"""
+        variables = template_data.get("variables", {})
+        parts = []
+        try:
+            parsed = list(Formatter().parse(template_data["template"]))
+        except (KeyError, ValueError) as e:
+            raise StoryGraphError(f"{where}: invalid template ({e})") from e
+
+        for literal, field, format_spec, conversion in parsed:
+            if field is None:
+                parts.append((literal, None))
+                continue
+            if format_spec or conversion:
+                raise StoryGraphError(
+                    f"{where}: format specs are not supported in {{{field}}}"
+                )
+            options = variables.get(field)
+            if not options:
+                raise StoryGraphError(f"{where}: no options for variable '{field}'")
+            parts.append((literal, tuple(options)))
+
+        return cls(parts=tuple(parts))
+
+    def render(self, rng: random.Random = random) -> str:
+        """Fill each variable with a random option"""
+        choice = rng.choice
+        return "".join(
+            [
+                literal + choice(options) if options else literal
+                for literal, options in self.parts
+            ]
+        )
+
+
+@dataclass(frozen=True)
+class StoryNode:
+    """A story segment and the choices leading out of it"""
+
+    id: str
+    template: CompiledTemplate
+    choices: Tuple[Dict[str, str], ...]
+    edges: FrozenSet[str]
+    ending: bool = False
+
+
+class StoryGraph:
+    """
+    Immutable story graph compiled from the "story" section of prompts.json.
+
+    Each choice id names the node it leads to, so a transition is a set
+    membership check plus a dict lookup.
+    """
+
+    def __init__(self, nodes: Mapping[str, StoryNode], root: str):
+        self.nodes = MappingProxyType(dict(nodes))
+        self.root = root
+
+    @classmethod
+    def compile(cls, prompts: Dict[str, Any]) -> "StoryGraph":
+        """Compile story content, rejecting broken templates and edges"""
+        story = prompts.get("story")
+        if not story or not story.get("nodes"):
+            raise StoryGraphError("Story content has no 'story.nodes' section")
+
+        nodes = {}
+        for node_id, spec in story["nodes"].items():
+            where = f"node '{node_id}'"
+            if "prompt" in spec:
+                if spec["prompt"] not in prompts:
+                    raise StoryGraphError(f"{where}: unknown prompt '{spec['prompt']}'")
+                template_data = prompts[spec["prompt"]]
+            else:
+                template_data = spec
+
+            choices = tuple(
+                {"id": c["id"], "text": c["text"]} for c in spec.get("choices", [])
+            )
+            nodes[node_id] = StoryNode(
+                id=node_id,
+                template=CompiledTemplate.compile(template_data, where),
+                choices=choices,
+                edges=frozenset(c["id"] for c in choices),
+                ending=spec.get("ending", False),
+            )
+
+        root = story.get("root", "start")
+        if root not in nodes:
+            raise StoryGraphError(f"Root node '{root}' is not defined")
+
+        for node in nodes.values():
+            missing = sorted(node.edges - nodes.keys())
+            if missing:
+                raise StoryGraphError(
+                    f"node '{node.id}': choices lead to undefined nodes {missing}"
+                )
+
+        return cls(nodes, root)
+
+    def get(self, node_id: str) -> Optional[StoryNode]:
+        return self.nodes.get(node_id)
+
+    def transition(self, node_id: str, choice: str) -> StoryNode:
+        """Follow a choice out of a node"""
+        node = self.nodes.get(node_id)
+        if node is None or choice not in node.edges:
+            raise ValueError(f"Invalid choice: {choice}")
+        return self.nodes[choice]
+
+    def validate(self) -> List[str]:
+        """List unreachable nodes and non-ending nodes without choices"""
+        reachable = {self.root}
+        frontier = [self.root]
+        while frontier:
+            for target in self.nodes[frontier.pop()].edges:
+                if target not in reachable:
+                    reachable.add(target)
+                    frontier.append(target)
+
+        issues = [
+            f"node '{node_id}' is unreachable from '{self.root}'"
+            for node_id in self.nodes
+            if node_id not in reachable
+        ]
+        issues.extend(
+            f"node '{node.id}' is a dead end (no choices and not marked as an ending)"
+            for node in self.nodes.values()
+            if not node.choices and not node.ending
+        )
+        return issues
@@ -80,6 +80,17 @@ async def mock_api_handler():
     return MockAPIHandler()
 
 
+@pytest_asyncio.fixture
+async def mock_llm_server(monkeypatch):
+    """Start a local OpenAI-compatible mock server and point APIHandler at it."""
+    from src.api.mock_llm_server import MockLLMServer
+
+    server = MockLLMServer({"seed": 1234})
+    monkeypatch.setenv("API_BASE_URL", await server.start())
+    yield server
+    await server.stop()
+
+
 def pytest_configure(config: Any) -> None:
     config.addinivalue_line("markers", "integration: mark test as an integration test")
 
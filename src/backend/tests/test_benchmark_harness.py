@@ -0,0 +1,63 @@
+import random
+import pytest
+from src.benchmarks.harness import compare, mann_whitney_u, run_benchmark, summarize
+
+
+def test_summarize():
+    stats = summarize([3.0, 1.0, 2.0, 4.0, 100.0])
+
+    assert stats["n"] == 5
+    assert stats["median"] == 3.0
+    assert stats["min"] == 1.0
+    assert stats["p95"] == 100.0
+
+
+def test_mann_whitney_separates_shifted_samples():
+    rng = random.Random(3)
+    base = [rng.gauss(1.0, 0.05) for _ in range(30)]
+    same = [rng.gauss(1.0, 0.05) for _ in range(30)]
+    slower = [rng.gauss(1.3, 0.05) for _ in range(30)]
+
+    assert mann_whitney_u(base, same) > 0.05
+    assert mann_whitney_u(base, slower) < 0.001
+    assert mann_whitney_u([1.0] * 10, [1.0] * 10) == 1.0
+
+
+def test_compare_verdicts():
+    rng = random.Random(5)
+    base = [rng.gauss(1.0, 0.02) for _ in range(20)]
+    current = {
+        "steady": [rng.gauss(1.0, 0.02) for _ in range(20)],
+        "slower": [rng.gauss(1.5, 0.02) for _ in range(20)],
+        "faster": [rng.gauss(0.5, 0.02) for _ in range(20)],
+        # Significant but within the threshold is still noise
+        "slightly": [rng.gauss(1.05, 0.02) for _ in range(20)],
+        "added": [1.0],
+    }
+    baseline = {name: base for name in current if name != "added"}
+
+    verdicts = {c["name"]: c["verdict"] for c in compare(current, baseline)}
+    assert verdicts == {
+        "steady": "unchanged",
+        "slower": "regression",
+        "faster": "improvement",
+        "slightly": "unchanged",
+        "added": "new",
+    }
+
+
+@pytest.mark.asyncio
+async def test_run_benchmark_warmup_and_reset():
+    calls = []
+
+    async def op():
+        calls.append("op")
+
+    samples = await run_benchmark(
+        op, warmup=2, repeats=3, inner=4, reset=lambda: calls.append("reset")
+    )
+
+    assert len(samples) == 3
+    assert calls.count("reset") == 5
+    assert calls.count("op") == 20
+    assert calls[:5] == ["reset", "op", "op", "op", "op"]
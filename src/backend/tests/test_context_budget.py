@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.api.api_handler import APIHandler
+from src.api.context_budget import ContextBudget
+
+
+def total_tokens(budget, messages):
+    return sum(budget.count(m["content"]) for m in messages)
+
+
+def test_prompt_stays_bounded_as_session_grows():
+    budget = ContextBudget({"max_context_tokens": 300, "summary_tokens": 80})
+
+    sizes = []
+    for i in range(200):
+        budget.add_turn("s1", "user", f"Turn {i}. I open door number {i} slowly.")
+        budget.add_turn("s1", "assistant", f"Door {i} creaks open. " * 10)
+        sizes.append(total_tokens(budget, budget.build_messages("s1")))
+
+    assert max(sizes) <= 300
+    assert max(sizes[100:]) <= max(sizes[:20]) * 2
+
+
+def test_recent_turns_verbatim_and_older_summarized():
+    budget = ContextBudget({"recent_turns": 2, "fold_batch": 2})
+    for i in range(5):
+        budget.add_turn("s1", "user", f"Choice {i}. More detail here.")
+
+    messages = budget.build_messages("s1")
+    assert messages[0]["role"] == "system"
+    assert "user: Choice 0." in messages[0]["content"]
+    assert "More detail" not in messages[0]["content"]
+    assert [m["content"] for m in messages[1:]] == [
+        "Choice 2. More detail here.",
+        "Choice 3. More detail here.",
+        "Choice 4. More detail here.",
+    ]
+
+
+def test_summary_prefix_cached_between_folds():
+    budget = ContextBudget({"recent_turns": 2, "fold_batch": 3})
+    for i in range(5):
+        budget.add_turn("s1", "user", f"Choice {i}.")
+
+    prefix = budget.summary_message("s1")
+    budget.add_turn("s1", "user", "Choice 5.")
+    assert budget.summary_message("s1") is prefix
+
+    for i in range(6, 9):
+        budget.add_turn("s1", "user", f"Choice {i}.")
+    assert budget.summary_message("s1") is not prefix
+
+
+def test_context_dict_truncated_to_cap():
+    budget = ContextBudget({"context_tokens": 20})
+    messages = budget.build_messages(None, {"history": ["word"] * 500})
+
+    assert len(messages) == 1
+    assert budget.count(messages[0]["content"]) <= 30
+
+
+@pytest.mark.asyncio
+async def test_generate_story_content_sends_bounded_delta(monkeypatch):
+    sent = []
+
+    async def chat(request):
+        body = await request.json()
+        sent.append(body["messages"])
+        return web.json_response(
+            {
+                "choices": [{"message": {"content": "The story goes on. " * 20}}],
+                "usage": {"total_tokens": 3},
+                "model": body["model"],
+            }
+        )
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat)
+    server = TestServer(app)
+    await server.start_server()
+    monkeypatch.setenv("API_BASE_URL", str(server.make_url("")).rstrip("/"))
+    try:
+        handler = APIHandler()
+        handler.rate_limiter.capacity = handler.rate_limiter._tokens = 100
+        for i in range(30):
+            result = await handler.generate_story_content(
+                f"I choose path {i}", session_id="s1"
+            )
+            assert result["content"]
+    finally:
+        await server.close()
+        await handler.pool.shutdown()
+
+    assert len(sent) == 30
+    assert len(sent[-1]) <= len(sent[10]) + 2
+    assert sent[-1][-1] == {"role": "user", "content": "I choose path 29"}
+    assert sent[-1][1]["content"].startswith("Story so far:")
@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.api.api_handler import APIHandler
+from src.api.http_pool import HTTPClientPool
+from src.backend.role_play_engine import RolePlayEngine
+
+
+@pytest.fixture
+async def echo_server():
+    async def chat(request):
+        body = await request.json()
+        return web.json_response(
+            {
+                "choices": [{"message": {"content": body["messages"][-1]["content"]}}],
+                "usage": {"total_tokens": 3},
+                "model": body["model"],
+            }
+        )
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections(echo_server):
+    pool = HTTPClientPool({"limit": 4, "limit_per_host": 2})
+    try:
+        session = await pool.startup()
+        for _ in range(5):
+            async with session.get(echo_server.make_url("/missing")) as response:
+                await response.read()
+
+        metrics = pool.metrics()
+        assert metrics["requests"] == 5
+        assert metrics["in_flight"] == 0
+        assert metrics["connections_created"] == 1
+        assert metrics["connections_reused"] == 4
+        assert metrics["limit_per_host"] == 2
+    finally:
+        await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_handlers_share_one_session(echo_server, monkeypatch):
+    monkeypatch.setenv("API_BASE_URL", str(echo_server.make_url("")).rstrip("/"))
+    first, second = APIHandler(), APIHandler()
+    await first.initialize()
+    await second.initialize()
+    assert first.session is second.session
+
+    results = await asyncio.gather(
+        first.generate_story_content("one"), second.generate_story_content("two")
+    )
+    assert [r["content"] for r in results] == ["one", "two"]
+
+    await first.close()
+    assert not second.session.closed
+    await first.pool.shutdown()
+
+
+def test_session_from_previous_loop_is_closed():
+    pool = HTTPClientPool()
+
+    async def get_session():
+        return pool.session()
+
+    first = asyncio.run(get_session())
+    second = asyncio.run(get_session())
+
+    assert first is not second
+    assert first.closed
+    asyncio.run(pool.shutdown())
+
+
+@pytest.mark.asyncio
+async def test_engine_lifecycle_opens_and_closes_pool(echo_server, monkeypatch):
+    monkeypatch.setenv("API_BASE_URL", str(echo_server.make_url("")).rstrip("/"))
+    handler = APIHandler()
+    engine = RolePlayEngine(api_handler=handler)
+
+    await engine.initialize()
+    session = handler.pool.session()
+    assert not session.closed
+
+    await engine.close()
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_pool_stays_open_until_last_owner_closes(echo_server, monkeypatch):
+    monkeypatch.setenv("API_BASE_URL", str(echo_server.make_url("")).rstrip("/"))
+    handler = APIHandler()
+    first = RolePlayEngine(api_handler=handler)
+    second = RolePlayEngine(api_handler=handler)
+    await first.initialize()
+    await second.initialize()
+    session = handler.pool.session()
+
+    # An engine that never opened the pool must not close it
+    await RolePlayEngine().close()
+    assert not session.closed
+
+    await first.close()
+    assert not session.closed
+    assert (await handler.generate_story_content("still open"))["content"] == (
+        "still open"
+    )
+
+    await second.close()
+    assert session.closed
@@ -52,3 +52,31 @@ async def test_story_continuity(engine, user_id):
         assert response["status"] == "success"
 
     assert len(story_segments) == len(choices)
+
+
+@pytest.mark.asyncio
+async def test_story_cursors_are_per_session(engine):
+    """Test that one session's progress does not leak into another"""
+    await engine.start_session("cursor_user_a")
+    await engine.process_choice("cursor_user_a", "investigate")
+
+    # A later session still starts at the intro with the opening choices
+    response = await engine.start_session("cursor_user_b")
+    assert [c["id"] for c in response["choices"]] == [
+        "investigate",
+        "retreat",
+        "explore",
+    ]
+    assert engine.sessions["cursor_user_a"]["story_state"] == {
+        "current_node": "investigate"
+    }
+    assert engine.sessions["cursor_user_b"]["story_state"] == {
+        "current_node": "start"
+    }
+
+    # Both sessions advance independently from their own positions
+    await engine.process_choice("cursor_user_b", "investigate")
+    await engine.process_choice("cursor_user_a", "hide")
+    assert engine.sessions["cursor_user_b"]["story_state"] == {
+        "current_node": "investigate"
+    }
@@ -0,0 +1,124 @@
+import argparse
+import json
+import random
+import pytest
+from src.api.api_handler import APIHandler
+from src.api.load_generator import (
+    _main,
+    api_target,
+    default_users,
+    engine_target,
+    percentile,
+    run_load,
+)
+from src.api.mock_llm_server import parse_latency, sample_latency
+from src.backend.role_play_engine import RolePlayEngine
+from src.backend.session_manager import SessionManager
+
+
+@pytest.fixture
+async def handler(mock_llm_server):
+    handler = APIHandler()
+    handler.rate_limiter.rate = handler.rate_limiter.capacity = 1000
+    handler.retry_delay = 0.01
+    yield handler
+    await handler.pool.shutdown()
+
+
+def test_latency_distributions():
+    rng = random.Random(7)
+    spec = parse_latency("lognormal:0.05:0.5")
+    samples = sorted(sample_latency(spec, rng) for _ in range(2001))
+
+    assert 0.04 < samples[1000] < 0.06
+    assert samples[1900] > samples[1000] * 1.5
+    assert sample_latency(parse_latency("fixed:0.2"), rng) == 0.2
+    with pytest.raises(ValueError):
+        parse_latency("pareto:1")
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+@pytest.mark.asyncio
+async def test_handler_retries_injected_429s(handler, mock_llm_server):
+    mock_llm_server.config["error_rate_429"] = 0.3
+
+    report = await run_load(api_target(handler), qps=200, duration=0.5)
+
+    assert mock_llm_server.stats["errors_429"] > 0
+    # Three attempts each: only a 0.3**3 tail should exhaust retries
+    assert report.error_rate < 0.15
+    assert report.to_dict()["p99"] is not None
+
+
+@pytest.mark.asyncio
+async def test_injected_500s_reported_as_errors(handler, mock_llm_server):
+    mock_llm_server.config["error_rate_500"] = 1.0
+    handler.max_retries = 1
+
+    report = await run_load(api_target(handler), qps=100, duration=0.2)
+
+    assert report.error_rate == 1.0
+    assert mock_llm_server.stats["errors_500"] == report.requests
+
+
+@pytest.mark.asyncio
+async def test_streaming_under_load(handler, mock_llm_server):
+    mock_llm_server.config["tokens_per_second"] = 2000
+
+    report = await run_load(api_target(handler, stream=True), qps=100, duration=0.3)
+
+    assert report.error_rate == 0.0
+    assert mock_llm_server.stats["streams"] == report.requests
+    assert handler.stream_metrics.completed == report.requests
+
+
+@pytest.mark.asyncio
+async def test_engine_load(handler, mock_llm_server, tmp_path):
+    mock_llm_server.config["tokens_per_second"] = 2000
+    engine = RolePlayEngine(
+        session_manager=SessionManager(tmp_path), api_handler=handler
+    )
+    try:
+        report = await run_load(engine_target(engine, users=5), qps=200, duration=0.5)
+    finally:
+        await engine.close()
+
+    assert report.requests == 100
+    assert report.error_rate == 0.0
+    # Choices are narrated through the API, not just the local story graph
+    assert mock_llm_server.stats["streams"] > 0
+    assert handler.stream_metrics.completed == mock_llm_server.stats["streams"]
+    # Finished sessions are ended, so replaying never hits the session limit
+    ended = [
+        path
+        for path in tmp_path.glob("*.json")
+        if json.loads(path.read_text()).get("status") == "completed"
+    ]
+    assert len(ended) > 5
+
+
+@pytest.mark.asyncio
+async def test_engine_cli_defaults_reach_llm(monkeypatch):
+    # _main points API_BASE_URL at its own mock server; restore it afterwards
+    monkeypatch.setenv("API_BASE_URL", "")
+    args = argparse.Namespace(
+        target="engine",
+        qps=100.0,
+        duration=0.5,
+        users=None,
+        latency=parse_latency("fixed:0.001"),
+        error_429=0.0,
+        error_500=0.0,
+    )
+
+    result = await _main(args)
+
+    assert default_users(args.qps, args.duration) == 5
+    assert result["error_rate"] == 0.0
+    assert result["server"]["requests"] > 0
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import pytest
+from src.api.api_handler import APIHandler
+from src.api.log_sink import AsyncLogSink, get_log_sink
+from src.backend.role_play_engine import RolePlayEngine
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.asyncio
+async def test_records_written_in_batches(tmp_path):
+    sink = AsyncLogSink(
+        tmp_path / "api.jsonl", {"batch_size": 10, "flush_interval": 0.05}
+    )
+
+    for i in range(25):
+        assert sink.emit({"n": i})
+    await sink.close()
+
+    assert [r["n"] for r in read_records(tmp_path / "api.jsonl")] == list(range(25))
+    assert sink.written == 25
+    assert sink.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_drop_policy_counts_dropped_records(tmp_path):
+    sink = AsyncLogSink(tmp_path / "api.jsonl", {"max_queue": 5})
+
+    # Nothing is written until the loop runs, so the queue fills up
+    results = [sink.emit({"n": i}) for i in range(8)]
+    await sink.close()
+
+    assert results.count(False) == 3
+    assert sink.dropped == 3
+    assert len(read_records(tmp_path / "api.jsonl")) == 5
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_room(tmp_path):
+    sink = AsyncLogSink(
+        tmp_path / "api.jsonl", {"max_queue": 2, "batch_size": 2, "policy": "block"}
+    )
+
+    await asyncio.wait_for(
+        asyncio.gather(*[sink.put({"n": i}) for i in range(10)]), timeout=5
+    )
+    await sink.close()
+
+    assert sink.dropped == 0
+    assert len(read_records(tmp_path / "api.jsonl")) == 10
+
+
+def test_emit_without_event_loop_writes_directly(tmp_path):
+    sink = AsyncLogSink(tmp_path / "api.jsonl")
+
+    assert sink.emit({"n": 1})
+    assert read_records(tmp_path / "api.jsonl") == [{"n": 1}]
+
+
+@pytest.mark.asyncio
+async def test_api_interactions_follow_block_policy(tmp_path):
+    handler = APIHandler()
+    handler.log_sink = AsyncLogSink(
+        tmp_path / "api.jsonl", {"max_queue": 1, "batch_size": 1, "policy": "block"}
+    )
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            *[handler.log_api_interaction("chat", True, {"n": i}) for i in range(5)]
+        ),
+        timeout=5,
+    )
+    await handler.log_sink.close()
+    await handler.pool.shutdown()
+
+    assert all(results)
+    assert handler.log_sink.dropped == 0
+    assert len(read_records(tmp_path / "api.jsonl")) == 5
+
+
+@pytest.mark.asyncio
+async def test_records_logged_before_close_reach_disk(tmp_path, mock_llm_server):
+    handler = APIHandler()
+    handler.log_sink = AsyncLogSink(tmp_path / "api.jsonl", {"flush_interval": 5})
+    try:
+        for i in range(5):
+            await handler.generate_story_content(f"story {i}")
+        await handler.close()
+    finally:
+        await handler.pool.shutdown()
+
+    assert handler.log_sink.written == 5
+    assert len(read_records(tmp_path / "api.jsonl")) == 5
+
+
+@pytest.mark.asyncio
+async def test_engine_close_flushes_log_sinks(tmp_path):
+    sink = get_log_sink(tmp_path / "engine.jsonl", {"flush_interval": 5})
+    engine = RolePlayEngine()
+    sink.emit({"n": 1})
+
+    await engine.close()
+
+    assert read_records(tmp_path / "engine.jsonl") == [{"n": 1}]
+
+
+@pytest.mark.asyncio
+async def test_size_rotation(tmp_path):
+    path = tmp_path / "api.jsonl"
+    sink = AsyncLogSink(path, {"max_bytes": 200, "backup_count": 2, "batch_size": 1})
+
+    for i in range(30):
+        await sink.put({"n": i, "padding": "x" * 20})
+    await sink.close()
+
+    assert path.stat().st_size <= 200
+    assert (tmp_path / "api.jsonl.1").exists()
+    assert (tmp_path / "api.jsonl.2").exists()
+    assert not (tmp_path / "api.jsonl.3").exists()
+
+
+def test_unknown_policy_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        AsyncLogSink(tmp_path / "api.jsonl", {"policy": "spill"})
@@ -3,12 +3,15 @@ import asyncio
 import time
 
 # Engine fixture is automatically available from conftest.py
+#
+# Absolute timings live in the benchmark suite (python -m src.benchmarks),
+# which compares repeated runs against a stored baseline. The tests here
+# only check behaviour under concurrency and relative scaling.
 
 
 @pytest.mark.asyncio
 async def test_concurrent_sessions(engine):
     """Test handling multiple sessions"""
-    start_time = time.time()
     user_count = 5
     user_ids = [f"perf_user_{i}" for i in range(user_count)]
 
@@ -28,21 +31,140 @@ async def test_concurrent_sessions(engine):
     assert len(choice_responses) == user_count
     assert all(r["status"] == "success" for r in choice_responses)
 
-    end_time = time.time()
-    assert end_time - start_time < 2.0  # Performance threshold
+
+def test_benchmark_suite_smoke():
+    """Run each available benchmark once so the suite cannot rot"""
+    from src.benchmarks.suite import BENCHMARKS, run_suite
+
+    results = asyncio.run(run_suite(warmup=0, repeats=2))
+
+    assert set(results) == set(BENCHMARKS)
+    for name in ("session.create", "engine.process_choice", "response.format_story"):
+        assert results[name]["stats"]["n"] == 2
+        assert results[name]["stats"]["median"] > 0
+
+
+def test_session_creation_flat_with_live_sessions(tmp_path):
+    """Test create_session latency does not grow with the number of live sessions"""
+    from src.backend.session_manager import SessionManager
+
+    def median_create_time(manager, prefix, samples=50):
+        timings = []
+        for i in range(samples):
+            start = time.perf_counter()
+            manager.create_session(f"{prefix}_{i}")
+            timings.append(time.perf_counter() - start)
+        return sorted(timings)[samples // 2]
+
+    manager = SessionManager(session_directory=tmp_path)
+    baseline = median_create_time(manager, "small")
+
+    # Register 100k live sessions in memory only; disk writes are not under test
+    for i in range(100_000):
+        manager._track(
+            f"bulk_{i}",
+            {"session_id": f"bulk_{i}", "user_id": f"bulk_user_{i % 50_000}"},
+        )
+
+    loaded = median_create_time(manager, "large")
+    assert len(manager.active_sessions) > 100_000
+    assert loaded < baseline * 3 + 0.001
+
+
+class SlowStoryGenerator:
+    """Wraps the real generator, adding a fixed await to each segment"""
+
+    def __init__(self, generator, delay):
+        self.generator = generator
+        self.delay = delay
+
+    def get_valid_choices(self, last_choice):
+        return self.generator.get_valid_choices(last_choice)
+
+    async def generate_story_segment(self, context, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        return await self.generator.generate_story_segment(context, *args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_choice_contention(engine):
+    """Benchmark same-user serialization against cross-user parallelism"""
+    delay = 0.02
+    user_count = 20
+    chain = ["investigate", "hide", "wait"]
+    engine.story_generator = SlowStoryGenerator(engine.story_generator, delay)
+    user_ids = [f"contention_user_{i}" for i in range(user_count)]
+    for user_id in user_ids:
+        await engine.start_session(user_id)
+
+    # Different users: one choice each, all in flight together
+    start_time = time.perf_counter()
+    await asyncio.gather(*[engine.process_choice(u, chain[0]) for u in user_ids])
+    parallel_time = time.perf_counter() - start_time
+
+    # Same user: the remaining chain submitted concurrently must apply in order
+    start_time = time.perf_counter()
+    responses = await asyncio.gather(
+        *[engine.process_choice(user_ids[0], choice) for choice in chain[1:]]
+    )
+    serial_time = time.perf_counter() - start_time
+
+    print(
+        f"\n{user_count} users in parallel: {parallel_time * 1000:.1f}ms, "
+        f"{len(chain) - 1} choices for one user: {serial_time * 1000:.1f}ms"
+    )
+    assert parallel_time < delay * user_count / 4
+    assert serial_time >= delay * (len(chain) - 1)
+    assert all(r["status"] == "success" for r in responses)
+
+    history = engine.session_manager.get_session_history(
+        engine.sessions[user_ids[0]]["session_id"]
+    )
+    assert [event["choice"] for event in history] == chain
 
 
 @pytest.mark.asyncio
-async def test_response_time(engine, user_id):
-    """Test individual operation response times"""
-    # Test session start time
-    start_time = time.time()
-    await engine.start_session(user_id)
-    session_time = time.time() - start_time
-    assert session_time < 0.5  # 500ms threshold
-
-    # Test choice processing time
-    start_time = time.time()
-    await engine.process_choice(user_id, "investigate")
-    choice_time = time.time() - start_time
-    assert choice_time < 0.5  # 500ms threshold
+async def test_segment_generation_allocations():
+    """Benchmark per-call allocations of compiled segments against rebuilding templates"""
+    import copy
+    import random
+    import tracemalloc
+    from src.backend.story_generator import StoryCursor, StoryGenerator
+
+    generator = StoryGenerator()
+    raw_nodes = generator.prompts["story"]["nodes"]
+    cursor = StoryCursor("investigate")
+
+    async def compiled():
+        return await generator.generate_story_segment({"choice": "hide"}, cursor)
+
+    async def rebuilt():
+        # What each call cost before: a fresh consequence table plus str.format
+        consequences = copy.deepcopy(raw_nodes)
+        node = consequences["hide"]
+        text = node["template"].format(
+            **{k: random.choice(v) for k, v in node["variables"].items()}
+        )
+        return {"current_node": "hide", "story_text": text, "choices": node["choices"]}
+
+    async def peak_bytes(fn, calls=50):
+        await fn()
+        tracemalloc.start()
+        try:
+            peaks = []
+            for _ in range(calls):
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                await fn()
+                peaks.append(tracemalloc.get_traced_memory()[1] - base)
+            return sorted(peaks)[calls // 2]
+        finally:
+            tracemalloc.stop()
+
+    compiled_bytes = await peak_bytes(compiled)
+    rebuilt_bytes = await peak_bytes(rebuilt)
+    print(
+        f"\nper-call peak allocation: compiled {compiled_bytes}B, "
+        f"rebuilt {rebuilt_bytes}B"
+    )
+    assert compiled_bytes * 4 < rebuilt_bytes
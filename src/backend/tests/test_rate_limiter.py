@@ -0,0 +1,78 @@
+import asyncio
+import time
+import pytest
+from src.api.rate_limiter import SingleFlight, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_bucket_waits_instead_of_failing():
+    bucket = TokenBucket(rate=50, capacity=2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[bucket.acquire() for _ in range(4)])
+    elapsed = time.perf_counter() - start
+
+    # Two tokens are available at once, the other two refill at 20ms each
+    assert 0.03 <= elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_bucket_fair_queuing():
+    bucket = TokenBucket(rate=200, capacity=1)
+    await bucket.acquire()
+    order = []
+
+    async def request(session_id, priority, label):
+        await bucket.acquire(session_id, priority)
+        order.append(label)
+
+    await asyncio.gather(
+        request("busy", "analysis", "analysis"),
+        *[request("busy", "story", f"busy{i}") for i in range(3)],
+        request("quiet", "story", "quiet"),
+    )
+
+    # Story before analysis; the quiet session is not stuck behind the busy one
+    assert order == ["busy0", "quiet", "busy1", "busy2", "analysis"]
+
+
+@pytest.mark.asyncio
+async def test_bucket_rejects_unknown_priority():
+    with pytest.raises(ValueError):
+        await TokenBucket(rate=1, capacity=1).acquire(priority="bulk")
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_in_flight_calls():
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"content": "shared"}
+
+    results = await asyncio.gather(*[flight.do("prompt", upstream) for _ in range(5)])
+    assert calls == 1
+    assert all(r == {"content": "shared"} for r in results)
+    assert flight.inflight == 0
+
+    await flight.do("prompt", upstream)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_cancelled_caller():
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", upstream))
+    second = asyncio.create_task(flight.do("key", upstream))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
@@ -1,3 +1,4 @@
+import json
 import pytest
 from src.backend.response_handler import ResponseHandler, ResponseType
 
@@ -52,3 +53,30 @@ def test_response_validation(handler):
     invalid_response = {"type": "success", "content": "Test"}
 
     assert not handler.validate_response(invalid_response)
+
+
+def test_unknown_template_fields_fail_at_load():
+    class BadTemplates(ResponseHandler):
+        def _load_templates(self):
+            return {"story": "{content} ({mood})"}
+
+    with pytest.raises(ValueError) as exc_info:
+        BadTemplates()
+    assert "mood" in str(exc_info.value)
+
+
+def test_missing_data_field(handler):
+    response = handler.format_response(ResponseType.STORY, {"content": "Hi"})
+
+    assert response["type"] == "error"
+    assert "choices" in response["content"]
+
+
+def test_json_payload_matches_dict_response(handler):
+    choices = [{"id": "go", "text": 'Say "hello"'}, {"id": "stay", "text": "Wait\\n"}]
+    payload = handler.format_story_response_json("Café ☕ ahead.", choices)
+
+    assert isinstance(payload, bytes)
+    assert json.loads(payload) == handler.format_story_response(
+        "Café ☕ ahead.", choices
+    )
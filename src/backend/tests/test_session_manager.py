@@ -29,10 +29,10 @@ async def test_session_state(engine, user_id):
     session_response = await engine.start_session(user_id)
     print(f"Session created with response: {session_response}")  # Debug
     print(f"Engine sessions before choices: {engine.sessions}")  # Updated debug message
-    
+
     # Verify session was actually stored
     assert user_id in engine.sessions, "Session was not stored in engine.sessions"
-    
+
     # Make several choices and verify state persistence
     choices = ["investigate", "hide", "wait"]
     for choice in choices:
@@ -54,3 +54,158 @@ async def test_multiple_sessions(engine):
 
     assert len(sessions) == session_count
     assert all(s["status"] == "success" for s in sessions)
+
+
+def test_history_appends_to_event_log(tmp_path):
+    """Test that each choice appends one log record instead of rewriting the snapshot"""
+    manager = SessionManager(session_directory=tmp_path)
+    session = manager.create_session("log_user")
+    session_id = session["session_id"]
+    snapshot = tmp_path / f"{session_id}.json"
+    snapshot_bytes = snapshot.read_bytes()
+
+    for choice in ["investigate", "hide", "wait"]:
+        assert manager.add_to_session_history(session_id, {"choice": choice})
+
+    log_lines = (tmp_path / f"{session_id}.log.jsonl").read_text().splitlines()
+    assert len(log_lines) == 3
+    assert snapshot.read_bytes() == snapshot_bytes
+
+
+def test_session_rebuilt_from_snapshot_and_log(tmp_path):
+    """Test that a fresh manager replays the event log on top of the snapshot"""
+    manager = SessionManager(session_directory=tmp_path)
+    session_id = manager.create_session("replay_user")["session_id"]
+    manager.add_to_session_history(session_id, {"choice": "investigate"})
+    manager.update_session(session_id, {"story_state": {"current_node": "investigate"}})
+
+    restored = SessionManager(session_directory=tmp_path).get_session(session_id)
+    assert [e["choice"] for e in restored["user_choices"]] == ["investigate"]
+    assert restored["story_state"] == {"current_node": "investigate"}
+    assert "_event_seq" not in restored
+
+
+def test_event_log_compaction(tmp_path):
+    """Test that the log is folded into the snapshot once it outgrows compaction_ratio of it"""
+    manager = SessionManager(
+        session_directory=tmp_path, compaction_ratio=0.5, compaction_min_bytes=0
+    )
+    session_id = manager.create_session("compact_user")["session_id"]
+    log_path = tmp_path / f"{session_id}.log.jsonl"
+    snapshot = tmp_path / f"{session_id}.json"
+
+    compactions = 0
+    for i in range(50):
+        manager.add_to_session_history(session_id, {"choice": f"c{i}"})
+        log_size = log_path.stat().st_size
+        assert log_size < 0.5 * snapshot.stat().st_size
+        compactions += log_size == 0
+    assert compactions >= 2
+
+    restored = SessionManager(session_directory=tmp_path).get_session(session_id)
+    assert len(restored["user_choices"]) == 50
+
+
+def test_bytes_written_per_choice_stay_flat(tmp_path):
+    """Test that write cost per choice does not grow with the session's history"""
+    manager = SessionManager(session_directory=tmp_path)
+    session_id = manager.create_session("long_user")["session_id"]
+    start = manager.bytes_written
+
+    def bytes_per_choice(choices):
+        for _ in range(
+            choices - len(manager.active_sessions[session_id]["user_choices"])
+        ):
+            manager.add_to_session_history(
+                session_id, {"choice": "investigate", "story_text": "x" * 100}
+            )
+        return (manager.bytes_written - start) / choices
+
+    early = bytes_per_choice(200)
+    late = bytes_per_choice(4000)
+    # Rewriting the whole session every N choices would make this grow ~20x
+    assert late < 2 * early
+
+
+def test_replay_skips_events_already_in_snapshot(tmp_path):
+    """Test that records folded into a snapshot are not applied twice"""
+    manager = SessionManager(session_directory=tmp_path)
+    session_id = manager.create_session("crash_user")["session_id"]
+    manager.add_to_session_history(session_id, {"choice": "investigate"})
+    log_path = tmp_path / f"{session_id}.log.jsonl"
+    stale_log = log_path.read_text()
+
+    # Simulate a crash after the snapshot was written but before truncation
+    manager._write_snapshot(session_id, manager.active_sessions[session_id])
+    log_path.write_text(stale_log + '{"seq": 2, "op": "cho')
+
+    restored = SessionManager(session_directory=tmp_path).get_session(session_id)
+    assert len(restored["user_choices"]) == 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sessions_expire_through_heap(tmp_path):
+    """Test that idle sessions expire and active ones are rescheduled"""
+    clock = FakeClock()
+    manager = SessionManager(session_directory=tmp_path, clock=clock)
+    timeout = manager.session_timeout.total_seconds()
+
+    idle_id = manager.create_session("expiry_user")["session_id"]
+    busy_id = manager.create_session("expiry_user")["session_id"]
+
+    clock.now += timeout / 2
+    assert manager.add_to_session_history(busy_id, {"choice": "investigate"})
+
+    clock.now += timeout / 2 + 1
+    assert [s["session_id"] for s in manager.get_user_sessions("expiry_user")] == [
+        busy_id
+    ]
+    assert idle_id not in manager.active_sessions
+
+    clock.now += timeout
+    assert manager.get_user_sessions("expiry_user") == []
+    assert manager._expiry_heap == []
+    assert manager._event_seq == {}
+    assert manager._log_bytes == {}
+    assert manager._snapshot_bytes == {}
+
+
+def test_current_session_skips_expired_newest(tmp_path):
+    """Test that an expired newest session falls back to an older live one"""
+    clock = FakeClock()
+    manager = SessionManager(session_directory=tmp_path, clock=clock)
+    timeout = manager.session_timeout.total_seconds()
+
+    older_id = manager.create_session("current_user")["session_id"]
+    newer_id = manager.create_session("current_user")["session_id"]
+
+    clock.now += timeout / 2
+    assert manager.get_session(older_id)
+
+    clock.now += timeout / 2 + 1
+    assert manager.get_current_session("current_user")["session_id"] == older_id
+    assert newer_id not in manager.active_sessions
+
+
+def test_session_limit_uses_user_index(tmp_path):
+    """Test max_sessions_per_user enforcement and release of ended sessions"""
+    manager = SessionManager(session_directory=tmp_path)
+    session_ids = [
+        manager.create_session("limit_user")["session_id"]
+        for _ in range(manager.max_sessions_per_user)
+    ]
+    manager.create_session("other_user")
+
+    with pytest.raises(ValueError):
+        manager.create_session("limit_user")
+
+    assert manager.end_session(session_ids[0])
+    assert manager.create_session("limit_user")["user_id"] == "limit_user"
+    assert len(manager.get_user_sessions("limit_user")) == 3
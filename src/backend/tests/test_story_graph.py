@@ -0,0 +1,93 @@
+import random
+import pytest
+from src.backend.story_graph import StoryGraph, StoryGraphError
+from src.backend.story_generator import StoryCursor, StoryGenerator
+
+
+def make_prompts(nodes):
+    return {
+        "intro": {"template": "Hello {who}.", "variables": {"who": ["you"]}},
+        "story": {"root": "start", "nodes": nodes},
+    }
+
+
+def test_shipped_story_graph_is_valid():
+    """Test that config/prompts.json compiles without validation issues"""
+    graph = StoryGenerator().graph
+    assert graph.validate() == []
+    for node in graph.nodes.values():
+        assert node.edges <= graph.nodes.keys()
+
+
+def test_transition_follows_edges_only():
+    graph = StoryGenerator().graph
+    assert graph.transition("start", "investigate").id == "investigate"
+    with pytest.raises(ValueError):
+        graph.transition("start", "hide")
+
+
+def test_compiled_template_renders_all_fields():
+    graph = StoryGraph.compile(
+        make_prompts(
+            {
+                "start": {
+                    "template": "A {x} and a {y}.",
+                    "variables": {"x": ["cat"], "y": ["dog"]},
+                    "ending": True,
+                }
+            }
+        )
+    )
+    assert graph.nodes["start"].template.render(random.Random(1)) == "A cat and a dog."
+
+
+def test_compile_rejects_undefined_targets():
+    with pytest.raises(StoryGraphError):
+        StoryGraph.compile(
+            make_prompts(
+                {
+                    "start": {
+                        "prompt": "intro",
+                        "choices": [{"id": "nowhere", "text": "?"}],
+                    }
+                }
+            )
+        )
+
+
+def test_compile_rejects_missing_variables():
+    with pytest.raises(StoryGraphError):
+        StoryGraph.compile(
+            make_prompts({"start": {"template": "A {missing}.", "variables": {}}})
+        )
+
+
+def test_validate_flags_unreachable_and_dead_end_nodes():
+    graph = StoryGraph.compile(
+        make_prompts(
+            {
+                "start": {
+                    "prompt": "intro",
+                    "choices": [{"id": "stuck", "text": "Go"}],
+                },
+                "stuck": {"prompt": "intro"},
+                "orphan": {"prompt": "intro", "ending": True},
+            }
+        )
+    )
+    issues = graph.validate()
+    assert any("'orphan' is unreachable" in issue for issue in issues)
+    assert any("'stuck' is a dead end" in issue for issue in issues)
+    assert len(issues) == 2
+
+
+@pytest.mark.asyncio
+async def test_generator_uses_cursor_position():
+    generator = StoryGenerator()
+    segment = await generator.generate_story_segment(
+        {"choice": "hide"}, StoryCursor("investigate")
+    )
+    assert segment["current_node"] == "hide"
+    assert [c["id"] for c in segment["choices"]] == [
+        c["id"] for c in generator.get_valid_choices("hide")
+    ]
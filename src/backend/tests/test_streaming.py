@@ -0,0 +1,141 @@
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.api.api_handler import APIHandler
+from src.backend.role_play_engine import RolePlayEngine
+
+
+@pytest.fixture
+async def sse_server():
+    state = {"disconnected": asyncio.Event(), "delay": 0.01}
+
+    async def chat(request):
+        body = await request.json()
+        assert body["stream"] is True
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            for word in ["Once ", "upon ", "a ", "time."]:
+                chunk = {"choices": [{"delta": {"content": word}}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(state["delay"])
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            state["disconnected"].set()
+            raise
+        return response
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat)
+    server = TestServer(app)
+    await server.start_server()
+    state["server"] = server
+    yield state
+    await server.close()
+
+
+@pytest.fixture
+async def handler(sse_server, monkeypatch):
+    monkeypatch.setenv(
+        "API_BASE_URL", str(sse_server["server"].make_url("")).rstrip("/")
+    )
+    handler = APIHandler()
+    yield handler
+    await handler.pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_incremental_tokens(handler):
+    deltas = [d async for d in handler.generate_story_stream("go", session_id="s1")]
+
+    assert deltas == ["Once ", "upon ", "a ", "time."]
+    summary = handler.stream_metrics.summary()
+    assert summary["completed"] == 1
+    assert 0 < summary["ttft_p50"] < 1
+    assert summary["tokens_per_sec"] > 0
+    assert handler.context_budget.build_messages("s1")[-1]["content"] == (
+        "Once upon a time."
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_cancellation_closes_upstream(handler, sse_server):
+    sse_server["delay"] = 0.2
+    stream = handler.generate_story_stream("go", session_id="s1")
+    assert await stream.__anext__() == "Once "
+    await stream.aclose()
+
+    await asyncio.wait_for(sse_server["disconnected"].wait(), timeout=2)
+    assert handler.stream_metrics.cancelled == 1
+    assert handler.context_budget.build_messages("s1") == []
+
+
+@pytest.mark.asyncio
+async def test_engine_streams_choice(handler, user_id):
+    engine = RolePlayEngine(api_handler=handler)
+    try:
+        await engine.start_session(user_id)
+        events = [e async for e in engine.process_choice_stream(user_id, "investigate")]
+
+        assert [e["content"] for e in events[:-1]] == ["Once ", "upon ", "a ", "time."]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["content"] == "Once upon a time."
+        assert events[-1]["choices"]
+
+        session = engine.session_manager.get_current_session(user_id)
+        assert session["story_state"]["current_node"] == "investigate"
+    finally:
+        await engine.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_stream_without_api_handler(engine, user_id):
+    await engine.start_session(user_id)
+    events = [e async for e in engine.process_choice_stream(user_id, "investigate")]
+
+    assert len(events) == 2
+    assert events[0]["content"] == events[1]["content"]
+
+    with pytest.raises(ValueError):
+        async for _ in engine.process_choice_stream(user_id, "not_a_choice"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_stream_errors_counted_separately(handler):
+    async def failing(*args, **kwargs):
+        yield {"choices": [{"delta": {"content": "Once "}}]}
+        raise ConnectionResetError("upstream closed")
+
+    handler._stream_request = failing
+    with pytest.raises(ConnectionResetError):
+        async for _ in handler.generate_story_stream("go"):
+            pass
+
+    summary = handler.stream_metrics.summary()
+    assert (summary["completed"], summary["errors"]) == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_engine_stream_does_not_hold_session_lock(handler, user_id):
+    engine = RolePlayEngine(api_handler=handler)
+    try:
+        await engine.start_session(user_id)
+        first, second = [
+            c["id"] for c in engine.story_generator.get_valid_choices("start")
+        ][:2]
+        stream = engine.process_choice_stream(user_id, first)
+        assert (await stream.__anext__())["type"] == "token"
+
+        # The paused stream must not block another choice for the session
+        await asyncio.wait_for(engine.process_choice(user_id, second), timeout=1)
+
+        with pytest.raises(ValueError):
+            async for _ in stream:
+                pass
+        session = engine.session_manager.get_current_session(user_id)
+        assert session["story_state"]["current_node"] == second
+    finally:
+        await engine.close()
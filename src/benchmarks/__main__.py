@@ -0,0 +1,113 @@
+"""
+Run the benchmark suite and record the results for this commit.
+
+    python -m src.benchmarks                       # run all, compare to baseline
+    python -m src.benchmarks -k "engine.*" -r 50   # subset, more repeats
+    python -m src.benchmarks --save-baseline       # make this run the baseline
+
+Results are written to src/benchmarks/results/<commit>.json. A benchmark
+counts as regressed when its median is more than --threshold slower than the
+baseline and a Mann-Whitney U test finds the difference significant.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .harness import compare
+from .suite import run_suite, select
+
+BENCH_DIR = Path(__file__).parent
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_samples(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        name: result["samples"]
+        for name, result in data["benchmarks"].items()
+        if "samples" in result
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", "--filter", action="append", help="glob on names")
+    parser.add_argument("-w", "--warmup", type=int, default=3)
+    parser.add_argument("-r", "--repeats", type=int, default=20)
+    parser.add_argument("--baseline", type=Path, default=BENCH_DIR / "baseline.json")
+    parser.add_argument("--output", type=Path, default=BENCH_DIR / "results")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # Per-request INFO logs from the Flask app would dominate the timings
+    logging.disable(logging.INFO)
+
+    results = asyncio.run(run_suite(select(args.filter), args.warmup, args.repeats))
+    current = {
+        name: result["samples"]
+        for name, result in results.items()
+        if "samples" in result
+    }
+    comparison = compare(current, load_samples(args.baseline), args.threshold)
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "warmup": args.warmup,
+        "repeats": args.repeats,
+        "benchmarks": results,
+        "comparison": comparison,
+    }
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    output_path = args.output / f"{commit}.json"
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:32} skipped ({result['skipped']})")
+            continue
+        stats = result["stats"]
+        verdict = next(c["verdict"] for c in comparison if c["name"] == name)
+        print(
+            f"{name:32} median {stats['median'] * 1e6:10.1f}us "
+            f"iqr {stats['iqr'] * 1e6:8.1f}us  {verdict}"
+        )
+    print(f"Results written to {output_path}")
+
+    regressed = [c["name"] for c in comparison if c["verdict"] == "regression"]
+    return 1 if regressed and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import gc
+import inspect
+import math
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Robust summary of per-operation timings in seconds"""
+    ordered = sorted(samples)
+    n = len(ordered)
+    quartiles = statistics.quantiles(ordered, n=4) if n > 1 else [ordered[0]] * 3
+    return {
+        "n": n,
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "stdev": statistics.stdev(ordered) if n > 1 else 0.0,
+        "iqr": quartiles[2] - quartiles[0],
+        "p95": ordered[min(n - 1, math.ceil(0.95 * n) - 1)],
+    }
+
+
+def mann_whitney_u(a: Sequence[float], b: Sequence[float]) -> float:
+    """
+    Two-sided p-value of the Mann-Whitney U test (normal approximation with
+    tie correction). Makes no normality assumption, which timing samples
+    rarely satisfy.
+    """
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+
+    ranked = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(ranked)
+    tie_term = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties**3 - ties
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def compare(
+    current: Dict[str, List[float]],
+    baseline: Dict[str, List[float]],
+    threshold: float = 0.10,
+    alpha: float = 0.05,
+) -> List[Dict[str, Any]]:
+    """
+    Compare samples per benchmark against a baseline.
+
+    A change is only reported when the medians differ by more than
+    ``threshold`` and the rank test says the difference is significant, so
+    run-to-run noise does not register as a regression.
+    """
+    results = []
+    for name, samples in current.items():
+        base = baseline.get(name)
+        if not base:
+            results.append({"name": name, "verdict": "new"})
+            continue
+
+        base_median = statistics.median(base)
+        median = statistics.median(samples)
+        ratio = median / base_median if base_median else math.inf
+        p_value = mann_whitney_u(samples, base)
+        if p_value < alpha and ratio > 1 + threshold:
+            verdict = "regression"
+        elif p_value < alpha and ratio < 1 - threshold:
+            verdict = "improvement"
+        else:
+            verdict = "unchanged"
+        results.append(
+            {
+                "name": name,
+                "baseline_median": base_median,
+                "median": median,
+                "ratio": ratio,
+                "p_value": p_value,
+                "verdict": verdict,
+            }
+        )
+    return results
+
+
+async def run_benchmark(
+    op: Callable[[], Any],
+    warmup: int = 3,
+    repeats: int = 20,
+    inner: int = 1,
+    reset: Optional[Callable[[], Any]] = None,
+) -> List[float]:
+    """
+    Time ``op`` and return one per-operation sample per repeat.
+
+    Each repeat calls ``op`` ``inner`` times back to back, with the garbage
+    collector paused as timeit does. ``reset`` runs untimed before every
+    repeat. Warmup repeats are run the same way and discarded. ``op`` and
+    ``reset`` may be plain functions or coroutine functions.
+    """
+    is_async = inspect.iscoroutinefunction(op)
+
+    async def call(fn: Optional[Callable[[], Any]]) -> None:
+        if fn is not None:
+            result = fn()
+            if inspect.isawaitable(result):
+                await result
+
+    samples = []
+    for repeat in range(warmup + repeats):
+        await call(reset)
+        gc.collect()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            if is_async:
+                for _ in range(inner):
+                    await op()
+            else:
+                for _ in range(inner):
+                    op()
+            elapsed = time.perf_counter() - start
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if repeat >= warmup:
+            samples.append(elapsed / inner)
+    return samples
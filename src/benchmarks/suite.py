@@ -0,0 +1,194 @@
+"""
+Benchmark cases for the hot paths of the app.
+
+Each case is an async context manager that builds its fixtures in a scratch
+directory and yields a ``Case``. Cases whose dependencies are not installed
+raise ImportError and are reported as skipped.
+"""
+
+import fnmatch
+import itertools
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional
+from unittest import mock
+
+from .harness import run_benchmark, summarize
+
+
+@dataclass
+class Case:
+    op: Callable[[], Any]
+    inner: int = 1
+    reset: Optional[Callable[[], Any]] = None
+
+
+BENCHMARKS: Dict[str, Callable[[Path], AsyncContextManager[Case]]] = {}
+
+
+def benchmark(name: str):
+    """Register an async context manager factory as a benchmark case"""
+
+    def register(factory):
+        BENCHMARKS[name] = asynccontextmanager(factory)
+        return factory
+
+    return register
+
+
+@benchmark("session.create")
+async def session_create(workdir: Path):
+    from src.backend.session_manager import SessionManager
+
+    manager = SessionManager(session_directory=workdir)
+    users = itertools.count()
+    yield Case(lambda: manager.create_session(f"bench_{next(users)}"), inner=50)
+    manager.close()
+
+
+@benchmark("engine.start_session")
+async def engine_start_session(workdir: Path):
+    from src.backend.role_play_engine import RolePlayEngine
+    from src.backend.session_manager import SessionManager
+
+    engine = RolePlayEngine(SessionManager(session_directory=workdir))
+    users = itertools.count()
+
+    async def op():
+        await engine.start_session(f"bench_{next(users)}")
+
+    yield Case(op, inner=50)
+    await engine.close()
+
+
+@benchmark("engine.process_choice")
+async def engine_process_choice(workdir: Path):
+    from src.backend.role_play_engine import RolePlayEngine
+    from src.backend.session_manager import SessionManager
+
+    engine = RolePlayEngine(SessionManager(session_directory=workdir))
+    inner = 50
+    user_ids = [f"bench_{i}" for i in range(inner)]
+    for user_id in user_ids:
+        await engine.start_session(user_id)
+    pending: List[str] = []
+
+    def reset():
+        # Every session back at the start node, untimed
+        for user_id in user_ids:
+            session = engine.session_manager.get_current_session(user_id)
+            engine.session_manager.update_session(
+                session["session_id"], {"story_state": {"current_node": "start"}}
+            )
+        pending[:] = user_ids
+
+    async def op():
+        await engine.process_choice(pending.pop(), "investigate")
+
+    yield Case(op, inner=inner, reset=reset)
+    await engine.close()
+
+
+@benchmark("story.segment")
+async def story_segment(workdir: Path):
+    from src.backend.story_generator import StoryCursor, StoryGenerator
+
+    generator = StoryGenerator()
+    cursor = StoryCursor("investigate")
+
+    async def op():
+        await generator.generate_story_segment({"choice": "hide"}, cursor)
+
+    yield Case(op, inner=1000)
+
+
+@benchmark("response.format_story")
+async def response_format_story(workdir: Path):
+    from src.backend.response_handler import ResponseHandler
+
+    handler = ResponseHandler()
+    choices = [{"id": "hide", "text": "Hide"}, {"id": "continue", "text": "Go on"}]
+    text = "You notice strange footprints leading into the dark forest. " * 4
+    yield Case(lambda: handler.format_story_response(text, choices), inner=1000)
+
+
+@benchmark("response.format_story_json")
+async def response_format_story_json(workdir: Path):
+    from src.backend.response_handler import ResponseHandler
+
+    handler = ResponseHandler()
+    choices = [{"id": "hide", "text": "Hide"}, {"id": "continue", "text": "Go on"}]
+    text = "You notice strange footprints leading into the dark forest. " * 4
+    yield Case(lambda: handler.format_story_response_json(text, choices), inner=1000)
+
+
+@benchmark("character.generate")
+async def character_generate(workdir: Path):
+    import utils
+
+    # Time trait selection and similarity checks, not the AI enhancement call
+    enhance = utils.enhance_character_description
+    utils.enhance_character_description = lambda character: character
+    try:
+        yield Case(utils.generate_character, inner=100)
+    finally:
+        utils.enhance_character_description = enhance
+
+
+@benchmark("flask.routes")
+async def flask_routes(workdir: Path):
+    # Scratch database and session files, without leaking either setting
+    # into the rest of the process
+    env = {
+        "DATABASE_URL": os.environ.get(
+            "DATABASE_URL", f"sqlite:///{workdir / 'bench.db'}"
+        ),
+        "SESSION_FILE_DIR": str(workdir / "flask_session"),
+    }
+    with mock.patch.dict(os.environ, env):
+        from app import create_app
+
+        app = create_app()
+    if app is None:
+        raise ImportError("Flask app could not be created")
+    client = app.test_client()
+    paths = ["/", "/login", "/register"]
+
+    def op():
+        for path in paths:
+            client.get(path)
+
+    yield Case(op, inner=20)
+
+
+def select(patterns: Optional[List[str]] = None) -> List[str]:
+    """Benchmark names matching any of the glob patterns (all by default)"""
+    if not patterns:
+        return list(BENCHMARKS)
+    return [
+        name
+        for name in BENCHMARKS
+        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+    ]
+
+
+async def run_suite(
+    names: Optional[List[str]] = None, warmup: int = 3, repeats: int = 20
+) -> Dict[str, Dict[str, Any]]:
+    """Run benchmarks; returns stats and raw samples, or a skip reason, per name"""
+    results = {}
+    for name in names or list(BENCHMARKS):
+        with tempfile.TemporaryDirectory() as workdir:
+            try:
+                async with BENCHMARKS[name](Path(workdir)) as case:
+                    samples = await run_benchmark(
+                        case.op, warmup, repeats, case.inner, case.reset
+                    )
+            except ImportError as e:
+                results[name] = {"skipped": str(e)}
+                continue
+        results[name] = {"stats": summarize(samples), "samples": samples}
+    return results
@@ -3,6 +3,7 @@ import logging
 import openai
 from typing import Dict, Any, List
 from models import Character, Scenario
+import metrics
 from flask_login import current_user
 
 # Configure logging
@@ -89,15 +90,16 @@ def generate_story_scene(character: Character, scenario: Scenario) -> Dict[str,
             spiciness_level = getattr(current_user, 'spiciness_level', 1)
         
         # Generate story content
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": get_spiciness_prompt(spiciness_level)},
-                {"role": "user", "content": get_story_prompt(character, scenario)}
-            ],
-            max_tokens=1000,
-            temperature=0.8
-        )
+        with metrics.timed('openai', 'story_scene'):
+            response = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": get_spiciness_prompt(spiciness_level)},
+                    {"role": "user", "content": get_story_prompt(character, scenario)}
+                ],
+                max_tokens=1000,
+                temperature=0.8
+            )
         
         story_content = response.choices[0].message.content
         
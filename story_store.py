@@ -0,0 +1,106 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+import metrics
+from models import db, StoryScene
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.environ.get('STORY_CACHE_SIZE', 256))
+
+class SceneCache:
+    """
+    Per-process LRU of recently viewed scenes, keyed by scene id.
+
+    Scene rows are never updated (a regenerated story is a new version),
+    so cached entries cannot go stale and need no invalidation.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._entries: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scene_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(scene_id)
+            if entry is not None:
+                self._entries.move_to_end(scene_id)
+            return entry
+
+    def put(self, scene_id: int, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[scene_id] = entry
+            self._entries.move_to_end(scene_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+cache = SceneCache()
+
+def _entry(scene: StoryScene) -> Dict[str, Any]:
+    return {
+        'id': scene.id,
+        'user_id': scene.user_id,
+        'character_id': scene.character_id,
+        'scenario_id': scene.scenario_id,
+        'version': scene.version,
+        'content': scene.content
+    }
+
+def save_scene(user_id: int, character_id: int, scenario_id: int, content: Dict[str, Any]) -> Dict[str, Any]:
+    """Store content as the next version for (user, character, scenario)"""
+    for attempt in range(2):
+        try:
+            version = db.session.query(func.coalesce(func.max(StoryScene.version), 0)).filter_by(
+                user_id=user_id, character_id=character_id, scenario_id=scenario_id
+            ).scalar() + 1
+            scene = StoryScene(
+                user_id=user_id,
+                character_id=character_id,
+                scenario_id=scenario_id,
+                version=version,
+                content=content
+            )
+            db.session.add(scene)
+            db.session.commit()
+            entry = _entry(scene)
+            cache.put(scene.id, entry)
+            return entry
+        except IntegrityError:
+            # A concurrent request took this version; retry with the next one
+            db.session.rollback()
+            if attempt:
+                raise
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to save story scene: {str(e)}")
+            raise
+
+def get_scene(scene_id: int) -> Optional[Dict[str, Any]]:
+    """Read-through lookup by id"""
+    entry = cache.get(scene_id)
+    if entry is not None:
+        metrics.cache_hit('story_scene')
+        return entry
+    metrics.cache_miss('story_scene')
+    scene = db.session.get(StoryScene, scene_id)
+    if scene is None:
+        return None
+    entry = _entry(scene)
+    cache.put(scene_id, entry)
+    return entry
+
+def latest_scene(user_id: int, character_id: int, scenario_id: int) -> Optional[Dict[str, Any]]:
+    """Newest version for (user, character, scenario), or None"""
+    scene_id = db.session.query(StoryScene.id).filter_by(
+        user_id=user_id, character_id=character_id, scenario_id=scenario_id
+    ).order_by(StoryScene.version.desc()).limit(1).scalar()
+    return get_scene(scene_id) if scene_id is not None else None
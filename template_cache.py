@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from flask import Flask, g
+from jinja2 import ChoiceLoader, FileSystemBytecodeCache, ModuleLoader
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUNDLE = os.path.join(ROOT, 'templates_compiled.zip')
+DEFAULT_CACHE_DIR = os.path.join(ROOT, '.jinja_cache')
+
+class BundleLoader(ModuleLoader):
+    """
+    Loads templates precompiled by build_bundle.
+
+    The bundle cannot enumerate its contents, so it reports none and the
+    filesystem loader it is chained with lists the templates instead.
+    """
+
+    def list_templates(self):
+        return []
+
+def build_bundle(path: str = DEFAULT_BUNDLE) -> int:
+    """
+    Compile every template under templates/ (including auth/) into a zip
+    of Python modules. Uses a bare Flask app so no database is needed; its
+    Jinja environment matches the one create_app builds.
+    Returns the number of templates compiled.
+    """
+    app = Flask('app', root_path=ROOT)
+    names = app.jinja_env.list_templates()
+    app.jinja_env.compile_templates(path, zip='deflated', ignore_errors=False)
+    logger.info(f"Compiled {len(names)} templates into {path}")
+    return len(names)
+
+def configure_templates(app) -> None:
+    """
+    Set up template loading for the app.
+
+    Compiled templates are cached on disk, so a fresh worker deserializes
+    them instead of recompiling. In production, templates are not
+    stat-checked on each render, and a prebuilt bundle is used when one exists.
+    """
+    production = app.config.get('PRODUCTION', False)
+    app.config['TEMPLATES_AUTO_RELOAD'] = not production
+    app.jinja_env.auto_reload = not production
+
+    cache_dir = os.environ.get('JINJA_CACHE_DIR', DEFAULT_CACHE_DIR)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    except OSError as e:
+        logger.error(f"Template bytecode cache disabled: {str(e)}")
+
+    bundle = os.environ.get('TEMPLATE_BUNDLE', DEFAULT_BUNDLE)
+    if production and os.path.exists(bundle):
+        app.jinja_env.loader = ChoiceLoader([BundleLoader(bundle), app.jinja_env.loader])
+        logger.info(f"Loading precompiled templates from {bundle}")
+
+def measure_first_request(app) -> None:
+    """
+    Log how long the first request in each process takes.
+
+    Forked workers inherit the parent's compiled templates; this shows
+    whether a worker still pays a warm-up cost on its first request.
+    """
+    state = {'pending': True}
+
+    def reset_after_fork():
+        state['pending'] = True
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=reset_after_fork)
+
+    @app.before_request
+    def start_first_request_timer():
+        if state['pending']:
+            state['pending'] = False
+            g.first_request_started = time.perf_counter()
+
+    @app.after_request
+    def log_first_request(response):
+        started = g.pop('first_request_started', None)
+        if started is not None:
+            elapsed = (time.perf_counter() - started) * 1000
+            logger.info(f"First request in process {os.getpid()} took {elapsed:.1f}ms")
+        return response
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Precompile Jinja templates into a bundle')
+    parser.add_argument('--output', default=DEFAULT_BUNDLE, help='bundle zip to write')
+    args = parser.parse_args()
+    try:
+        build_bundle(args.output)
+    except Exception as e:
+        logger.error(f"Template compilation failed: {str(e)}")
+        sys.exit(1)